@@ -0,0 +1,209 @@
+"""
+Sharded, resumable run of the OpenAI Batch API (replaces upload_batch.py + get_batch_results.py
+for large inputs).
+
+    python batch_manager.py                          # openai_batch_input.jsonl -> llm_results/results.jsonl
+    python batch_manager.py --base-url http://127.0.0.1:8080/v1   # e.g. a local mock of the batch API
+
+1. The input (created by create_batch.py) is split into shards below the provider's limits
+   (requests per batch and bytes per file) in SHARD_DIR.
+2. Every shard is uploaded, submitted as a batch, polled until it is done and its output is
+   downloaded; up to MAX_PARALLEL_SHARDS shards at the same time.
+3. The outputs are concatenated in custom_id order and written like get_batch_results.py
+   does (merged with cached responses, expanded to all rows).
+
+The state of every shard (file ids, batch id, status) is written to MANIFEST_JSON after each
+step, so a crashed or interrupted run continues where it stopped: uploaded files are not
+uploaded again and submitted batches are polled instead of submitted again. Failed, expired
+or cancelled shards, and completed ones without any output, are submitted again on the next
+run. Requests that failed inside a finished batch are downloaded from its error file to
+SHARD_DIR/errors_*.jsonl and reported. The manifest belongs to one input; if the input
+changes, the shards are created from scratch.
+
+Only ``files.create``, ``files.content``, ``batches.create`` and ``batches.retrieve`` of the
+client are used, so any object offering them can stand in for ``OpenAI()``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from openai import OpenAI
+
+from get_batch_results import OUTPUT_PATH, save_results
+from keyed_jsonl import custom_id_order
+from source_cache import file_digest
+
+INPUT_JSONL = "openai_batch_input.jsonl"
+SHARD_DIR = Path("batch_shards")
+MANIFEST_JSON = SHARD_DIR / "manifest.json"
+MAX_REQUESTS_PER_SHARD = 50_000
+MAX_SHARD_BYTES = 190 * 1024 * 1024  # below the 200 MB file limit
+MAX_PARALLEL_SHARDS = 4
+POLL_SECONDS = 60
+COMPLETION_WINDOW = "24h"
+ENDPOINT = "/v1/chat/completions"
+
+FINISHED = {"completed", "failed", "expired", "cancelled"}
+RESUBMIT = {"failed", "expired", "cancelled"}
+
+
+def split_input(input_path: Path, shard_dir: Path = SHARD_DIR, max_requests: int = MAX_REQUESTS_PER_SHARD,
+                max_bytes: int = MAX_SHARD_BYTES) -> list[dict]:
+    """Split the batch input into shard files; returns their manifest entries."""
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    shards: list[dict] = []
+    out, n, size = None, 0, 0
+
+    def start_shard():
+        path = shard_dir / f"input_{len(shards):03d}.jsonl"
+        shards.append({"input": str(path), "requests": 0, "status": "split"})
+        return open(path, "wb")
+
+    with open(input_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if out is None or n >= max_requests or size + len(line) > max_bytes:
+                if out is not None:
+                    out.close()
+                out, n, size = start_shard(), 0, 0
+            out.write(line)
+            n += 1
+            size += len(line)
+            shards[-1]["requests"] = n
+    if out is not None:
+        out.close()
+    return shards
+
+
+class Manifest:
+    """Shard states, written to disk (atomically) after every change."""
+
+    def __init__(self, path: Path, data: dict):
+        self.path = path
+        self.data = data
+        self.lock = threading.Lock()
+
+    @classmethod
+    def open(cls, input_path: Path, path: Path = MANIFEST_JSON) -> "Manifest":
+        digest = file_digest(input_path)
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("input_digest") == digest:
+                print(f"Resuming {len(data['shards'])} shards from {path}")
+                return cls(path, data)
+        manifest = cls(path, {"input_digest": digest, "shards": split_input(input_path, path.parent)})
+        manifest.save()
+        return manifest
+
+    @property
+    def shards(self) -> list[dict]:
+        return self.data["shards"]
+
+    def update(self, shard: dict, **changes) -> None:
+        with self.lock:
+            shard.update(changes)
+            self.save()
+
+    def save(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def run_shard(client, manifest: Manifest, shard: dict, poll_seconds: float = POLL_SECONDS) -> None:
+    """Take one shard from wherever it stopped to a downloaded output."""
+    name = Path(shard["input"]).name
+    if shard["status"] in RESUBMIT:
+        print(f"{name}: {shard['status']} before, submitting again")
+        manifest.update(shard, status="uploaded", batch_id=None, output_file_id=None, error_file_id=None,
+                        output=None, errors=None, failed_requests=0)
+
+    if shard["status"] == "split":
+        with open(shard["input"], "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        manifest.update(shard, status="uploaded", input_file_id=uploaded.id)
+
+    if shard["status"] == "uploaded":
+        batch = client.batches.create(
+            input_file_id=shard["input_file_id"],
+            endpoint=ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+            metadata={"description": f"classification of pizza ontology ({name})"},
+        )
+        manifest.update(shard, status=batch.status, batch_id=batch.id)
+        print(f"{name}: submitted as {batch.id} ({shard['requests']} requests)")
+
+    while shard["status"] not in FINISHED and shard["status"] != "downloaded":
+        time.sleep(poll_seconds)
+        batch = client.batches.retrieve(shard["batch_id"])
+        if batch.status != shard["status"]:
+            print(f"{name}: {batch.status}")
+        manifest.update(shard, status=batch.status, output_file_id=batch.output_file_id,
+                        error_file_id=batch.error_file_id)
+
+    if shard["status"] not in ("completed", "expired"):
+        return
+    # requests that failed inside a finished batch are listed in its error file
+    if shard.get("error_file_id"):
+        errors = Path(shard["input"]).with_name(name.replace("input_", "errors_"))
+        text = client.files.content(shard["error_file_id"]).text
+        errors.write_text(text, encoding="utf-8")
+        failed = sum(1 for line in text.splitlines() if line.strip())
+        manifest.update(shard, errors=str(errors), failed_requests=failed)
+        print(f"{name}: {failed} requests failed, see {errors}")
+    # expired batches may still have answered part of the requests
+    if shard.get("output_file_id"):
+        output = Path(shard["input"]).with_name(name.replace("input_", "output_"))
+        output.write_text(client.files.content(shard["output_file_id"]).text, encoding="utf-8")
+        manifest.update(shard, output=str(output), status="downloaded" if shard["status"] == "completed" else shard["status"])
+    elif shard["status"] == "completed":
+        # nothing was answered (e.g. every request failed): submit the shard again on the next run
+        manifest.update(shard, status="failed")
+        print(f"{name}: completed without any output, marked as failed")
+
+
+def run_batches(client, input_path: Path = Path(INPUT_JSONL), manifest_path: Path = MANIFEST_JSON,
+                workers: int = MAX_PARALLEL_SHARDS, poll_seconds: float = POLL_SECONDS) -> list[str]:
+    """Run all shards of ``input_path``; returns the output lines of all shards in custom_id order."""
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest.open(input_path, manifest_path)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(run_shard, client, manifest, s, poll_seconds) for s in manifest.shards]:
+            future.result()
+
+    lines = []
+    for shard in manifest.shards:
+        if shard.get("output"):
+            lines += [l for l in Path(shard["output"]).read_text(encoding="utf-8").splitlines() if l.strip()]
+    unfinished = [Path(s["input"]).name for s in manifest.shards if s["status"] != "downloaded"]
+    if unfinished:
+        print(f"[WARN] Not (fully) answered: {', '.join(unfinished)}; run again to resubmit them")
+    failed = [s for s in manifest.shards if s["status"] == "downloaded" and s.get("failed_requests")]
+    if failed:
+        print(f"[WARN] {sum(s['failed_requests'] for s in failed)} requests of completed shards failed, "
+              f"see {', '.join(s['errors'] for s in failed)}")
+    return sorted(lines, key=lambda line: custom_id_order(json.loads(line)["custom_id"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the batch input in resumable shards.")
+    parser.add_argument("--input", default=INPUT_JSONL)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible API, e.g. a local mock")
+    parser.add_argument("--workers", type=int, default=MAX_PARALLEL_SHARDS, help="shards in flight at once")
+    parser.add_argument("--poll-seconds", type=float, default=POLL_SECONDS)
+    args = parser.parse_args()
+
+    save_results(
+        run_batches(OpenAI(base_url=args.base_url), Path(args.input), workers=args.workers,
+                    poll_seconds=args.poll_seconds),
+        args.output,
+        input_digest=file_digest(Path(args.input)),
+    )
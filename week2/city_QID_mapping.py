@@ -1,22 +1,13 @@
 import json
-import requests
-import time
 import os
-import csv
 
-def main():
-    unique_cities = set()
-
-    # create cities.txt
-    with open('data.csv', 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            city = row["city"].strip()
-            if city:  # Only add non-empty city names
-                unique_cities.add(city)
+from menu_table import cities
+from qid_cache import resolve_qids_cached
 
+def main():
+    # create cities.txt (distinct, non-empty city names, read from the city column only)
     with open('cities.txt', 'w', encoding='utf-8') as output_file:
-        for city in sorted(unique_cities):  # Sort for consistent order
+        for city in cities('data.csv'):  # sorted for consistent order
             output_file.write(f"{city}\n")
 
     # work with cities.txt as input
@@ -39,50 +30,8 @@ def main():
                 all_cities.add(city)
 
 
-    # SPARQL query to find city QIDs
-    def get_wikidata_qid(city_name):
-        # Escape quotes in city names
-        safe_name = city_name.replace('"', '\\"')
-
-        query = f"""
-        SELECT DISTINCT ?item ?itemLabel WHERE {{
-          SERVICE wikibase:mwapi {{
-            bd:serviceParam wikibase:endpoint "www.wikidata.org";
-                            wikibase:api "EntitySearch";
-                            mwapi:search "{safe_name}";
-                            mwapi:language "en".
-            ?item wikibase:apiOutputItem mwapi:item.
-          }}
-    
-          # Filter for city types
-          VALUES ?cityTypes {{
-            wd:Q515     # City
-            wd:Q1549591 # Big city
-            wd:Q486972  # Human settlement
-            wd:Q3957    # Town
-            wd:Q7930989 # Village
-          }}
-          ?item (wdt:P31|wdt:P279) ?cityTypes.
-    
-          SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
-        }}
-        LIMIT 1
-        """
-
-        url = "https://query.wikidata.org/sparql"
-        headers = {"Accept": "application/json"}
-        params = {"query": query, "format": "json"}
-
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            if response.status_code == 200:
-                results = response.json().get("results", {}).get("bindings", [])
-                if results:
-                    return results[0]["item"]["value"].split("/")[-1]  # Extract QID
-        except Exception as e:
-            print(f"Query failed for {city_name}: {str(e)}")
-        return None
-
+    # Fetch QIDs for all new cities from the cache or Wikidata, many per request (see qid_cache.py)
+    wikidata_qids = resolve_qids_cached([c for c in all_cities if c not in city_qid_map], "city")
 
     # Create/update mapping for cities
     for city in sorted(all_cities):
@@ -92,8 +41,7 @@ def main():
             print(f"{city}: {status} ({city_qid_map[city].get('qid', 'N/A')})")
             continue
 
-        # Fetch QID from Wikidata
-        qid = get_wikidata_qid(city)
+        qid = wikidata_qids.get(city)
         city_qid_map[city] = {
             "qid": qid,
             "locked": False
@@ -105,8 +53,6 @@ def main():
         else:
             print(f"{city}: ❌ not found")
 
-        time.sleep(1)  # Respect rate limits
-
     # Save updated mapping
     with open("city_qid_map.json", "w", encoding="utf-8") as f:
         json.dump(city_qid_map, f, ensure_ascii=False, indent=2)
@@ -1,11 +1,20 @@
+import argparse
+import os
+from collections import Counter
+
+import numpy as np
 import pandas as pd
 
+from keyword_matcher import KeywordMatcher
+
 # Define the input and output file names
 input_file = 'data.csv'
 output_file = 'cleaned_data.csv'
 
-# Load the CSV file
-df = pd.read_csv(input_file)
+# Rows per batch of the chunked mode
+CHUNK_ROWS = 100_000
+# Categories listed in the report of the chunked mode
+REPORT_TOP = 25
 
 # Define a list of allowed keywords
 allowed_keywords = [
@@ -18,18 +27,79 @@ exclude_keywords = [
     'electronics', 'equipment', 'sporting goods', 'shoe store'
 ]
 
+# Both lists in one automaton (case-insensitive): True = allowed, False = excluded
+category_matcher = KeywordMatcher([(w, False) for w in exclude_keywords] + [(w, True) for w in allowed_keywords])
+
 def is_relevant_category(category):
-    category_lower = str(category).lower()
-    # Exclude if any forbidden keyword appears
-    if any(bad_word in category_lower for bad_word in exclude_keywords):
-        return False
-    # Include if any of the allowed keywords appear
-    return any(good_word in category_lower for good_word in allowed_keywords)
+    found = category_matcher.values(str(category))
+    # Exclude if any forbidden keyword appears, include if any of the allowed keywords appear
+    return False not in found and True in found
+
+
+def relevant_mask(categories):
+    # Vectorized over a column: every distinct value is matched once, the rows take its result
+    codes, uniques = pd.factorize(categories, use_na_sentinel=False)
+    relevant = np.fromiter((is_relevant_category(c) for c in uniques), dtype=bool, count=len(uniques))
+    return relevant[codes]
+
+
+def count_categories(categories, counts):
+    # "Pizza Place,Bar" counts for "Pizza Place" and for "Bar"
+    split = categories.str.split(',').explode().str.strip()
+    counts.update(split[split != ''].value_counts().to_dict())
+
+
+def clean_chunked(input_path, output_path, chunk_rows=CHUNK_ROWS):
+    """Filter the CSV in batches of ``chunk_rows`` rows, appending each batch to the output."""
+    kept, dropped = Counter(), Counter()
+    tmp = output_path + '.tmp'
+    header = True
+    rows_read = rows_kept = 0
+    # All columns as text, so every batch is written exactly as it was read
+    for chunk in pd.read_csv(input_path, chunksize=chunk_rows, dtype=str, keep_default_na=False):
+        mask = relevant_mask(chunk['categories'])
+        chunk[mask].to_csv(tmp, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        count_categories(chunk['categories'][mask], kept)
+        count_categories(chunk['categories'][~mask], dropped)
+        rows_read += len(chunk)
+        rows_kept += int(mask.sum())
+        print(f"{rows_read} rows read, {rows_kept} kept")
+    if header:  # empty input
+        pd.read_csv(input_path, nrows=0).to_csv(tmp, index=False)
+    os.replace(tmp, output_path)
+    return kept, dropped
+
+
+def print_report(kept, dropped, top=REPORT_TOP):
+    totals = kept + dropped
+    print(f"{'category':<40} {'kept':>10} {'dropped':>10}")
+    for category, _ in totals.most_common(top):
+        print(f"{category[:40]:<40} {kept[category]:>10} {dropped[category]:>10}")
+    if len(totals) > top:
+        print(f"... {len(totals) - top} more categories")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keep the rows of restaurants in relevant categories.")
+    parser.add_argument('--input', default=input_file)
+    parser.add_argument('--output', default=output_file)
+    parser.add_argument('--chunked', action='store_true',
+                        help="stream the CSV in batches (bounded memory) and report rows kept/dropped per category")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    if args.chunked:
+        kept, dropped = clean_chunked(args.input, args.output, args.chunk_rows)
+        print_report(kept, dropped)
+    else:
+        # Load the CSV file
+        df = pd.read_csv(args.input)
 
-# Filter the dataframe
-df_cleaned = df[df['categories'].apply(is_relevant_category)]
+        # Filter the dataframe
+        df_cleaned = df[df['categories'].apply(is_relevant_category)]
 
-# Save the cleaned data to a new CSV file
-df_cleaned.to_csv(output_file, index=False)
+        # Save the cleaned data to a new CSV file
+        df_cleaned.to_csv(args.output, index=False)
 
-print(f"Cleaned data saved to {output_file}")
+    print(f"Cleaned data saved to {args.output}")
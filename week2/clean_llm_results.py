@@ -8,14 +8,26 @@ Works with:
 
 Usage:
     python clean_pizza_json.py path/to/file.json
+    python clean_llm_results.py --stream --workers 8 llm_results/   # every *.jsonl of a directory
+
+With --stream, NDJSON files are cleaned chunk by chunk in a process pool: only a bounded
+number of chunks is in memory at any time, and the result is written to a temporary file
+that replaces the original only when it is complete.
 """
 from __future__ import annotations
 
+import argparse
 import json
-import re
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 from typing import Any, Iterable
 
+from keyword_matcher import KeywordMatcher
+from llm_results_store import parse_answer
+
 # --------------------------------------------------------------------------------------
 # 1️⃣  Configure your replacements here
 # --------------------------------------------------------------------------------------
@@ -51,14 +63,24 @@ REMOVE: set[str] = {
 }
 # --------------------------------------------------------------------------------------
 
+# both tables as rules of one matcher, see keyword_matcher.py; whole ingredients only
+# (exact() is a dict lookup), compared with the keys as written
+INGREDIENT_RULES = KeywordMatcher(
+    [(k, ("rename", v)) for k, v in RENAMES.items()] + [(k, ("remove", None)) for k in REMOVE],
+    case_sensitive=True,
+)
+
 
 def clean_ingredients(items: list[str]) -> list[str]:
     """Rename, drop and deduplicate ingredients (case-insensitive)."""
     seen: set[str] = set()
     out: list[str] = []
     for item in items:
-        item = RENAMES.get(item.lower(), item)  # rename if a synonym exists
-        if item.lower() in REMOVE:              # drop unwanted
+        rule = INGREDIENT_RULES.exact(item.lower())
+        if rule is not None and rule[0] == "rename":  # rename if a synonym exists
+            item = rule[1]
+            rule = INGREDIENT_RULES.exact(item.lower())
+        if rule is not None and rule[0] == "remove":  # drop unwanted
             continue
         key = item.lower()
         if key not in seen:                     # deduplicate
@@ -69,11 +91,9 @@ def clean_ingredients(items: list[str]) -> list[str]:
 
 def clean_message_content(content: str) -> str:
     """Pull JSON out of ```json ...```, clean it, put it back (unchanged if none)."""
-    m = re.search(r"```json\s*(.*?)\s*```", content, flags=re.S)
-    if not m:
+    if "```json" not in content:
         return content  # nothing to do
-    raw_json = m.group(1)
-    parsed: Any = json.loads(raw_json)
+    parsed: Any = parse_answer(content)
 
     def _process(entry: Any) -> Any:
         if (
@@ -119,37 +139,109 @@ def read_objects(path: Path) -> list[dict[str, Any]]:
 
 
 def write_objects(path: Path, objects: Iterable[dict[str, Any]], ndjson: bool) -> None:
-    """Write list of objects back in same format (array or NDJSON)."""
+    """Write list of objects back in same format (array or NDJSON), replacing the file atomically."""
+    tmp = path.with_name(f".{path.name}.tmp")
     if ndjson:
-        path.write_text("\n".join(json.dumps(o, ensure_ascii=False) for o in objects) + "\n")
+        tmp.write_text("\n".join(json.dumps(o, ensure_ascii=False) for o in objects) + "\n")
     else:
-        path.write_text(json.dumps(list(objects), indent=2, ensure_ascii=False) + "\n")
+        tmp.write_text(json.dumps(list(objects), indent=2, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def is_ndjson(path: Path) -> bool:
+    """NDJSON unless the first non-blank character opens an array."""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            block = block.lstrip()
+            if block:
+                return not block.startswith(b"[")
+    return True
 
 
 # ---------------------------  Main cleaning routine  ----------------------------------
 
 
+def clean_record(wrapper: dict[str, Any]) -> None:
+    """Clean the message contents of one batch-response record in place."""
+    body = wrapper.get("response", {}).get("body")
+    if not body:
+        return
+    for choice in body.get("choices", []):
+        msg = choice.get("message", {})
+        if "content" in msg:
+            msg["content"] = clean_message_content(msg["content"])
+
+
 def main(file_path: str) -> None:
     path = Path(file_path)
     objs = read_objects(path)
     # Remember the original format to preserve it on write
     original_was_ndjson = not path.read_text().lstrip().startswith("[")
     for wrapper in objs:
-        body = wrapper.get("response", {}).get("body")
-        if not body:
-            continue
-        for choice in body.get("choices", []):
-            msg = choice.get("message", {})
-            if "content" in msg:
-                msg["content"] = clean_message_content(msg["content"])
+        clean_record(wrapper)
     write_objects(path, objs, ndjson=original_was_ndjson)
     print("✓ File cleaned in-place.")
 
 
+# ---------------------------  Streaming mode  -----------------------------------------
+
+CHUNK_LINES = 5_000
+
+
+def clean_lines(lines: list[bytes]) -> bytes:
+    """Clean a chunk of NDJSON lines (runs in a worker process)."""
+    out = []
+    for line in lines:
+        if not line.strip():
+            continue  # skip blanks
+        wrapper = json.loads(line)
+        clean_record(wrapper)
+        out.append(json.dumps(wrapper, ensure_ascii=False) + "\n")
+    return "".join(out).encode("utf-8")
+
+
+def clean_ndjson_streaming(path: Path, pool: ProcessPoolExecutor, window: int, chunk_lines: int = CHUNK_LINES) -> None:
+    """Clean an NDJSON file chunk by chunk; at most ``window`` chunks are in flight."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            pending = deque()
+            for chunk in iter(lambda: list(islice(src, chunk_lines)), []):
+                pending.append(pool.submit(clean_lines, chunk))
+                if len(pending) >= window:
+                    dst.write(pending.popleft().result())  # chunks are written in input order
+            while pending:
+                dst.write(pending.popleft().result())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def main_streaming(target: str, workers: int | None = None, chunk_lines: int = CHUNK_LINES) -> None:
+    """Clean a results file, or every *.jsonl in a directory of result shards, in place."""
+    target = Path(target)
+    files = sorted(target.glob("*.jsonl")) if target.is_dir() else [target]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in files:
+            if not is_ndjson(path):
+                main(str(path))  # a JSON array has to be read as a whole anyway
+                continue
+            clean_ndjson_streaming(path, pool, window=2 * workers, chunk_lines=chunk_lines)
+            print(f"✓ {path} cleaned in-place.")
+
+
 # ---------------------------  Entry point  --------------------------------------------
 
 if __name__ == "__main__":
-    #if len(sys.argv) != 2:
-    #    sys.exit("Usage: python clean_pizza_json.py <batch.json>")
-    #main(sys.argv[1])
-    main("llm_results/results_15_complete.jsonl")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Normalise ingredient lists in batch-response files.")
+    parser.add_argument("path", nargs="?", default="llm_results/results_15_complete.jsonl",
+                        help="results file (or, with --stream, a directory of *.jsonl shards)")
+    parser.add_argument("--stream", action="store_true", help="clean NDJSON chunk by chunk in a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for --stream")
+    args = parser.parse_args()
+    if args.stream:
+        main_streaming(args.path, args.workers)
+    else:
+        main(args.path)
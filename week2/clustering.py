@@ -27,6 +27,8 @@ import matplotlib.pyplot as plt
 from sklearn.manifold import TSNE
 from matplotlib.colors import to_hex
 
+from keyword_matcher import KeywordMatcher
+
 # ─────────────────────── CONFIG ───────────────────────
 HF_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"  # 768‑d embeddings
 FINE_THRESHOLD = 0.30  # distance cutoff for synonym merge
@@ -77,11 +79,15 @@ def embed(texts: List[str], model_name: str = HF_MODEL_NAME, device: str = DEVIC
     model = SentenceTransformer(model_name, device=device)
     return model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
 
+# all keywords of all categories in one automaton; the first category (in dict order) wins
+CATEGORY_MATCHER = KeywordMatcher(
+    ((tok, (rank, cat)) for rank, (cat, vocab) in enumerate(CATEGORY_KEYWORDS.items()) for tok in vocab),
+    case_sensitive=True,
+)
+
 def assign_category(ingredient: str) -> str:
-    for cat, vocab in CATEGORY_KEYWORDS.items():
-        if any(tok in ingredient for tok in vocab):
-            return cat
-    return UNKNOWN_CATEGORY
+    matches = CATEGORY_MATCHER.values(ingredient)
+    return min(matches)[1] if matches else UNKNOWN_CATEGORY
 
 # ───────────── GLOBAL TOKEN STATS (pizza names) ─────────────
 pizza_names = [item["name"] for item in menu_items]
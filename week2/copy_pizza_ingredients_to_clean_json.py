@@ -1,34 +1,20 @@
 import json
 
+from llm_results_store import load_llm_results
+
 INPUT_FILE = "./llm_results/results_15_complete.jsonl"
 OUTPUT_FILE = "menu_items.json"
 
 def extract_pizza_items(input_path):
     menu_items = []
 
-    with open(input_path, "r", encoding="utf-8") as file:
-        for line in file:
-            try:
-                record = json.loads(line)
-                content = record["response"]["body"]["choices"][0]["message"]["content"]
-
-                # Extract JSON object from within triple-backtick block
-                json_start = content.find("{")
-                json_end = content.rfind("}")
-                if json_start == -1 or json_end == -1:
-                    continue
-
-                json_str = content[json_start:json_end+1]
-                item = json.loads(json_str)
-
-                if item.get("is_pizza") is True and isinstance(item.get("ingredients"), list):
-                    menu_items.append({
-                        "name": item["name"],
-                        "ingredients": item["ingredients"]
-                    })
-
-            except (json.JSONDecodeError, KeyError, TypeError):
-                continue  # skip invalid or malformed entries
+    # every menu item of every answer, parsed once (see llm_results_store.py)
+    for item in load_llm_results(input_path).items():
+        if item["is_pizza"] is True and isinstance(item["ingredients"], list) and item["name"] is not None:
+            menu_items.append({
+                "name": item["name"],
+                "ingredients": item["ingredients"]
+            })
 
     return menu_items
 
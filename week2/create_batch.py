@@ -1,5 +1,11 @@
-import csv
+import copy
 import json
+import os
+
+from keyed_jsonl import custom_id_order
+from llm_cache import ResponseCache, request_key
+from menu_table import iter_rows
+from source_cache import file_digest
 
 MODEL = "gpt-4.1-mini"
 SYSTEM_PROMPT = """Analyze an item to determine if it qualifies as a pizza based on its name and description.
@@ -60,31 +66,229 @@ name: "Pizza, Margherita" description: ""
 included_lines = [20, 10, 24, 11, 5, 42, 44, 45, 46, 55, 60, 59, 40, 83, 102, 103, 172, 179, 189]  # Example line numbers
 UPLOAD_FULL_BATCH = False
 
-def read_csv(file_path, included_lines):
-    items = []
-    with open(file_path, mode="r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for index, row in enumerate(reader):
-            if UPLOAD_FULL_BATCH or index-1 in included_lines:
-                name = row["menu item"]
-                description = row["item description"] or ""
-                items.append({
-                    "custom_id": f"{index}",
-                    "method": "POST",
-                    "url": "/v1/chat/completions",
-                    "body": {
-                        "model": MODEL,
-                        "messages": [
-                            {"role": "system", "content": SYSTEM_PROMPT},
-                            {"role": "user", "content": f"name: \"{name}\" description: \"{description}\""}
-                        ],
-                        "temperature": 1,
-                        "max_tokens": 1000,
-                    }
-                })
-    return items
-
-def write_jsonl(items, output_path="openai_batch_input.jsonl"):
+BATCH_INPUT_JSONL = "openai_batch_input.jsonl"
+
+DEDUPLICATE = True  # one request per distinct (name, description), see group_rows
+GROUPS_JSON = "openai_batch_groups.json"  # request custom_id -> custom_ids of all rows it answers
+KEYS_JSON = "openai_batch_keys.json"  # request custom_id -> response cache key, see llm_cache.py
+
+PACK_SIZE = 1  # menu items per request; > 1 packs them into one prompt, see pack_requests
+PACKS_JSON = "openai_batch_packs.json"  # packed request custom_id -> {row custom_id: user message}
+FALLBACK_JSONL = "openai_batch_input_fallback.jsonl"  # single requests for rows a packed answer missed
+PACKED_PROMPT_SUFFIX = """
+
+# Several Items
+The input contains several numbered items, one per line. Analyze every item on its own, as described above, and answer with a single JSON array that contains one object per item:
+```json
+[
+  {"index": 1, "result": <output for item 1>},
+  {"index": 2, "result": <output for item 2>}
+]
+```
+Use the number of the item as "index" and output every index exactly once."""
+
+
+def dedup_key(name, description):
+    # case and whitespace do not change the answer
+    return " ".join(name.lower().split()), " ".join(description.lower().split())
+
+
+def chat_request(custom_id, system_prompt, user_content, max_tokens=1000):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            "temperature": 1,
+            "max_tokens": max_tokens,
+        }
+    }
+
+
+def make_request(custom_id, name, description):
+    return chat_request(custom_id, SYSTEM_PROMPT, f"name: \"{name}\" description: \"{description}\"")
+
+
+def read_rows(file_path, included_lines):
+    """(custom_id, name, description) of the rows to classify."""
+    rows = []
+    for index, row in enumerate(iter_rows(file_path, ["menu item", "item description"])):
+        if UPLOAD_FULL_BATCH or index-1 in included_lines:
+            rows.append((f"{index}", row["menu item"], row["item description"] or ""))
+    return rows
+
+
+def group_rows(rows):
+    """
+    Group rows with the same normalized (name, description). Returns {custom_id of the first
+    row: [custom_ids of all rows of the group]}, in order of first occurrence.
+    """
+    first_of = {}
+    groups = {}
+    for custom_id, name, description in rows:
+        first = first_of.setdefault(dedup_key(name, description), custom_id)
+        groups.setdefault(first, []).append(custom_id)
+    return groups
+
+
+def read_csv(file_path, included_lines, deduplicate=False):
+    """
+    One chat-completion request per row, or, with ``deduplicate``, per distinct row. Returns
+    (items, groups); ``groups`` is needed to expand the results back to every row (expand_results).
+    """
+    rows = read_rows(file_path, included_lines)
+    groups = group_rows(rows) if deduplicate else {custom_id: [custom_id] for custom_id, _, _ in rows}
+    items = [make_request(custom_id, name, description) for custom_id, name, description in rows
+             if custom_id in groups]
+    return items, groups
+
+
+def expand_results(lines, groups):
+    """
+    Copy every result line (JSONL) of a deduplicated batch to all rows of its group, with the
+    row's custom_id, so the output has one line per row, ordered by custom_id.
+    """
+    expanded = []
+    for line in lines:
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        for custom_id in groups.get(result["custom_id"], [result["custom_id"]]):
+            expanded.append({**result, "custom_id": custom_id})
+    expanded.sort(key=lambda r: custom_id_order(r["custom_id"]))
+    return [json.dumps(r) for r in expanded]
+
+
+def packed_key(user_content):
+    """
+    Cache key of the answer to ``user_content`` that was split from a packed answer (see
+    unpack_results); it differs from the key of the single request, which has another prompt.
+    """
+    return request_key(chat_request(None, SYSTEM_PROMPT + PACKED_PROMPT_SUFFIX, user_content)["body"])
+
+
+def skip_cached(items, cache):
+    """
+    Leave out the requests that already have a cached response, as a single request or as part
+    of a packed one. Returns the remaining items and the cache keys of all items, which
+    get_batch_results.py needs to merge the responses.
+    """
+    candidates = {item["custom_id"]: (request_key(item["body"]), packed_key(item["body"]["messages"][-1]["content"]))
+                  for item in items}
+    cached = cache.get_many(key for pair in candidates.values() for key in pair)
+    keys = {}
+    for custom_id, (single, packed) in candidates.items():
+        # the answer to the single request is preferred
+        keys[custom_id] = packed if packed in cached and single not in cached else single
+    return [item for item in items if keys[item["custom_id"]] not in cached], keys
+
+
+def pack_requests(items, size=PACK_SIZE):
+    """
+    Put the user messages of ``size`` requests into one request with a numbered list, answered
+    with an indexed JSON array (see unpack_results). Returns the requests and the packs.
+    """
+    requests, packs = [], {}
+    for start in range(0, len(items), size):
+        chunk = items[start:start + size]
+        if len(chunk) == 1:
+            requests += chunk
+            continue
+        pack_id = f"pack-{chunk[0]['custom_id']}"
+        members = {item["custom_id"]: item["body"]["messages"][-1]["content"] for item in chunk}
+        user_content = "\n".join(f"{i}. {content}" for i, content in enumerate(members.values(), 1))
+        requests.append(chat_request(pack_id, SYSTEM_PROMPT + PACKED_PROMPT_SUFFIX, user_content,
+                                     max_tokens=1000 * len(chunk)))
+        packs[pack_id] = members
+    return requests, packs
+
+
+def parse_packed_answer(result, n):
+    """
+    Strictly parse the answer of a packed request with ``n`` items: {index: result} of all
+    indexes in 1..n that occur exactly once. Anything else (no array, duplicate or missing
+    indexes, malformed entries) leaves the affected indexes out.
+    """
+    try:
+        content = result["response"]["body"]["choices"][0]["message"]["content"]
+        answer = json.loads(content.replace("```json", "").replace("```", ""))
+    except (KeyError, IndexError, TypeError, ValueError):
+        return {}
+    if not isinstance(answer, list):
+        return {}
+    found = {}
+    for entry in answer:
+        if not isinstance(entry, dict) or "result" not in entry:
+            continue
+        index = entry.get("index")
+        if isinstance(index, int) and not isinstance(index, bool) and 1 <= index <= n:
+            found.setdefault(index, []).append(entry["result"])
+    return {index: results[0] for index, results in found.items() if len(results) == 1}
+
+
+def unpack_results(lines, packs):
+    """
+    Split the answers of packed requests into one result line per request they contain. Returns
+    the lines and single-item requests for the requests the packed answer did not cover.
+    """
+    unpacked, fallback = [], []
+    for line in lines:
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        members = packs.get(result["custom_id"])
+        if members is None:
+            unpacked.append(line)
+            continue
+        answers = parse_packed_answer(result, len(members)) if not result.get("error") else {}
+        for index, (custom_id, user_content) in enumerate(members.items(), 1):
+            if index not in answers:
+                fallback.append(chat_request(custom_id, SYSTEM_PROMPT, user_content))
+                continue
+            single = copy.deepcopy(result)
+            single["custom_id"] = custom_id
+            single["response"]["body"]["choices"][0]["message"]["content"] = json.dumps(answers[index])
+            unpacked.append(json.dumps(single))
+    return unpacked, fallback
+
+
+def write_sidecar(path, data, input_digests):
+    """Write ``data`` for the batch inputs with the given digests (see read_sidecar)."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"inputs": list(input_digests), "data": data}, f)
+
+
+def read_sidecar(path, input_digest):
+    """
+    The data of the sidecar ``path`` if it was written for the batch input with
+    ``input_digest``; None if there is none or it belongs to another (older) input.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    if input_digest is None or input_digest not in sidecar.get("inputs", []):
+        print(f"⚠️ {path} belongs to another batch input, not applied")
+        return None
+    return sidecar["data"]
+
+
+def add_sidecar_input(path, input_digest, updates=None):
+    """
+    Let the sidecar ``path`` apply to one more batch input, e.g. the fallback requests, with
+    the entries of ``updates`` replaced.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    write_sidecar(path, {**sidecar["data"], **(updates or {})}, sidecar["inputs"] + [input_digest])
+
+
+def write_jsonl(items, output_path=BATCH_INPUT_JSONL):
     with open(output_path, "w", encoding="utf-8") as f:
         for item in items:
             json.dump(item, f)
@@ -93,5 +297,19 @@ def write_jsonl(items, output_path="openai_batch_input.jsonl"):
 
 if __name__ == "__main__":
     csv_file_path = "data.csv"
-    batch_items = read_csv(csv_file_path, included_lines)
-    write_jsonl(batch_items)
+    batch_items, groups = read_csv(csv_file_path, included_lines, deduplicate=DEDUPLICATE)
+    with ResponseCache() as cache:
+        new_items, keys = skip_cached(batch_items, cache)
+    requests, packs = pack_requests(new_items) if PACK_SIZE > 1 else (new_items, {})
+    # the answers split from a packed answer are cached per item (see get_batch_results.py)
+    keys.update({custom_id: packed_key(user_content)
+                 for members in packs.values() for custom_id, user_content in members.items()})
+    write_jsonl(requests)
+    # the sidecars only apply to the results of this very input (see get_batch_results.py)
+    input_digests = [file_digest(BATCH_INPUT_JSONL)]
+    write_sidecar(GROUPS_JSON, groups, input_digests)
+    write_sidecar(KEYS_JSON, keys, input_digests)
+    write_sidecar(PACKS_JSON, packs, input_digests)
+    rows = sum(len(ids) for ids in groups.values())
+    print(f"✅ {len(requests)} requests for {len(new_items)} new items "
+          f"({len(batch_items) - len(new_items)} cached) of {rows} rows")
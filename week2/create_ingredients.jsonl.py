@@ -1,14 +1,11 @@
-import json
-
+from keyed_jsonl import write_keyed_jsonl
 from validate_classification import load_results_jsonl
 
 def main():
     res = load_results_jsonl("llm_results/results_15_complete.jsonl")
 
-    with open("ingredients.jsonl", "w", encoding="utf-8") as f:
-        for item in res.values():
-            json_line = json.dumps(item)
-            f.write(json_line + "\n")
+    # ordered by custom_id and indexed by it, so the integration joins by key, not by line number
+    write_keyed_jsonl("ingredients.jsonl", res.items())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+"""
+Materialize the Wikidata neighbourhood of all linked ingredients and cities locally.
+
+The integration only links to Wikidata (``owl:sameAs wd:Q…`` for ingredients,
+``schema:containedInPlace wd:Q…`` for cities), so queries that need facts about these items
+would have to federate with the Wikidata endpoint at query time. This stage fetches, in one
+batched pass over all QIDs of ingredient_qid_map.json and city_qid_map.json:
+
+    - the English labels of the items,
+    - their P31 (instance of) / P279 (subclass of) statements and the P279 closure above them,
+      with the English labels of those classes,
+    - the coordinates (P625) of the cities.
+
+The triples go into the named graph WIKIDATA_GRAPH, written as N-Quads to OUTPUT_NQ (load it
+into GraphDB next to pizza_data.ttl), or with ``--store`` into the on-disk store of the
+integration, so that pizza data and Wikidata facts can be queried together locally.
+
+The queries use the rate-limited, retrying client of qid_resolver.py (and its endpoint,
+i.e. WIKIDATA_SPARQL if set).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from rdflib import Dataset, Graph, URIRef
+
+from integrate_tabular_data_with_ontology import CITY_QID_MAP, ING_QID_MAP, STORE, STORE_PATH
+from qid_resolver import SPARQL_ENDPOINT, batched, run_queries
+
+OUTPUT_NQ = "wikidata_neighbourhood.nq"
+WIKIDATA_GRAPH = URIRef("http://ontology.daniel-motz.de/wikidata")
+QIDS_PER_QUERY = 100
+
+
+def linked_qids(*map_files: str) -> list[str]:
+    """All QIDs of the given mapping files (entries without a QID are skipped)."""
+    qids = set()
+    for map_file in map_files:
+        mapping = json.loads(Path(map_file).read_text(encoding="utf-8"))
+        qids.update(entry["qid"] for entry in mapping.values() if entry.get("qid"))
+    return sorted(qids)
+
+
+def build_construct_query(qids: list[str]) -> str:
+    values = " ".join(f"wd:{qid}" for qid in qids)
+    return f"""
+    CONSTRUCT {{ ?s ?p ?o }} WHERE {{
+      VALUES ?item {{ {values} }}
+      {{
+        # the item itself: label, classes, coordinates
+        VALUES ?p {{ rdfs:label wdt:P31 wdt:P279 wdt:P625 }}
+        ?item ?p ?o .
+        BIND(?item AS ?s)
+      }} UNION {{
+        # every class above it: superclasses and label
+        VALUES ?p {{ rdfs:label wdt:P279 }}
+        ?item (wdt:P31|wdt:P279)/wdt:P279* ?s .
+        ?s ?p ?o .
+      }}
+      FILTER(?p != rdfs:label || LANG(?o) = "en")
+    }}
+    """
+
+
+def fetch_neighbourhood(qids: list[str], into: Graph, endpoint: str = SPARQL_ENDPOINT) -> int:
+    """Add the neighbourhood of ``qids`` to ``into``; returns the number of failed queries."""
+    queries = [build_construct_query(batch) for batch in batched(qids, QIDS_PER_QUERY)]
+    failed = 0
+    for body in run_queries(queries, accept="text/turtle", endpoint=endpoint):
+        if body is None:
+            failed += 1
+            continue
+        into.parse(data=body, format="turtle")
+    return failed
+
+
+def main(store: str = STORE):
+    qids = linked_qids(ING_QID_MAP, CITY_QID_MAP)
+    print(f"Fetching the Wikidata neighbourhood of {len(qids)} linked items")
+
+    if store != "default":
+        # next to the integration output (STORE_GRAPH) in the same on-disk store
+        graph = Graph(store=store, identifier=WIKIDATA_GRAPH)
+        graph.open(STORE_PATH, create=True)
+        graph.remove((None, None, None))
+        failed = fetch_neighbourhood(qids, graph)
+        print(f"Stored {len(graph)} triples in <{WIKIDATA_GRAPH}> ({store} at {STORE_PATH})")
+        graph.close()
+    else:
+        dataset = Dataset()
+        graph = dataset.graph(WIKIDATA_GRAPH)
+        failed = fetch_neighbourhood(qids, graph)
+        dataset.serialize(destination=OUTPUT_NQ, format="nquads")
+        print(f"Wrote {len(graph)} triples in <{WIKIDATA_GRAPH}> to {OUTPUT_NQ}")
+
+    if failed:
+        print(f"[WARN] {failed} queries failed, run again to complete the neighbourhood")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch the Wikidata neighbourhood of all linked QIDs.")
+    parser.add_argument("--store", default=STORE,
+                        help=f"rdflib store plugin to write into instead of {OUTPUT_NQ}, e.g. Oxigraph")
+    args = parser.parse_args()
+    main(store=args.store)
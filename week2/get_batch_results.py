@@ -1,13 +1,84 @@
+import argparse
+import hashlib
+import json
+import os
+
 from openai import OpenAI
 
+from create_batch import (FALLBACK_JSONL, GROUPS_JSON, KEYS_JSON, PACKS_JSON, add_sidecar_input, expand_results,
+                          read_sidecar, unpack_results, write_jsonl)
+from keyed_jsonl import custom_id_order
+from llm_cache import ResponseCache, merge_cached_results, request_key
+from source_cache import file_digest
+
+
+OUTPUT_PATH = "llm_results/results.jsonl"
+
+
+def keep_previous_results(lines, output_path, custom_ids):
+    """
+    Add the result lines of ``custom_ids`` that ``output_path`` already holds and ``lines`` do
+    not, so fetching a part of a batch (e.g. its fallback requests) keeps the other rows.
+    """
+    if not os.path.exists(output_path):
+        return lines
+    answered = {json.loads(line)["custom_id"] for line in lines}
+    with open(output_path, "r", encoding="utf-8") as f:
+        previous = [json.loads(line) for line in f if line.strip()]
+    lines = lines + [json.dumps(r) for r in previous
+                     if r["custom_id"] in custom_ids and r["custom_id"] not in answered]
+    return sorted(lines, key=lambda line: custom_id_order(json.loads(line)["custom_id"]))
+
+
+def save_results(lines, output_path=OUTPUT_PATH, input_digest=None):
+    """
+    Write the batch output ``lines`` as one result line per row (see create_batch.py). The
+    sidecars of create_batch.py are only applied if they were written for the batch input
+    with ``input_digest`` (SHA-256 of the uploaded JSONL).
+    """
+    lines = [line for line in lines if line.strip()]
+    # split packed answers; items a packed answer missed need a single request each
+    packs = read_sidecar(PACKS_JSON, input_digest) or {}
+    if packs:
+        lines, fallback = unpack_results(lines, packs)
+        if fallback:
+            write_jsonl(fallback, FALLBACK_JSONL)
+            # the fallback results are merged and expanded like the ones of this input, and
+            # cached under the keys of the single requests
+            fallback_digest = file_digest(FALLBACK_JSONL)
+            add_sidecar_input(KEYS_JSON, fallback_digest, {r["custom_id"]: request_key(r["body"]) for r in fallback})
+            for sidecar in (GROUPS_JSON, PACKS_JSON):
+                add_sidecar_input(sidecar, fallback_digest)
+            print(f"⚠️ {len(fallback)} items were not answered in their pack, "
+                  f"run {FALLBACK_JSONL} as a batch and fetch its results again")
+    # store the fresh responses, add the ones create_batch.py left out because they were cached
+    keys = read_sidecar(KEYS_JSON, input_digest)
+    if keys is not None:
+        with ResponseCache() as cache:
+            lines = merge_cached_results(lines, keys, cache)
+    # a deduplicated batch answers several rows per request, copy the answers to every row
+    groups = read_sidecar(GROUPS_JSON, input_digest)
+    if groups is not None:
+        lines = expand_results(lines, groups)
+        lines = keep_previous_results(lines, output_path, {c for rows in groups.values() for c in rows})
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"✅ Batch output written to {output_path}")
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch the output of a finished batch.")
+    parser.add_argument("batch_id")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
     client = OpenAI()
-    output_path = "llm_results/results.jsonl"
+    batch = client.batches.retrieve(args.batch_id)
 
-    file_response = client.files.content("file-CYcZfckDSi2bMrdqxLayqb")
+    file_response = client.files.content(batch.output_file_id)
     print(file_response.text)
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(file_response.text)
-    print(f"✅ Batch output written to {output_path}")
\ No newline at end of file
+    # the sidecars of create_batch.py belong to the input this batch was created from
+    input_digest = hashlib.sha256(client.files.content(batch.input_file_id).content).hexdigest()
+    save_results(file_response.text.splitlines(), args.output, input_digest)
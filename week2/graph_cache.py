@@ -0,0 +1,59 @@
+"""
+Parse cache for RDF files (ontology.xml, pizza_data.ttl, …).
+
+``load_graph(path)`` parses a file once and keeps a pickled snapshot of the parsed rdflib
+Graph in CACHE_DIR. The snapshot is keyed by the SHA-256 of the file content, so it is
+invalidated automatically when the file changes; snapshots of older versions are removed.
+Loading a snapshot skips the pure-Python RDF/XML or Turtle parser entirely.
+
+Scripts outside week2 import it after adding week2 to ``sys.path``:
+
+    sys.path.append(str(Path(__file__).resolve().parent.parent / "week2"))
+    from graph_cache import load_graph
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+from rdflib import Graph
+
+from source_cache import file_digest
+
+CACHE_DIR = Path(__file__).resolve().parent / ".graph_cache"
+
+
+def _snapshot_prefix(path: Path) -> str:
+    # the resolved path keeps equally named files from different folders apart
+    return f"{path.name}-{hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:8]}-"
+
+
+def load_graph(path: str | Path, format: str | None = None, cache_dir: Path = CACHE_DIR) -> Graph:
+    """Return the parsed graph of ``path``, from the snapshot cache if the content is unchanged."""
+    path = Path(path)
+    prefix = _snapshot_prefix(path)
+    snapshot = cache_dir / f"{prefix}{file_digest(path)[:32]}.pickle"
+
+    if snapshot.exists():
+        try:
+            with open(snapshot, "rb") as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            pass  # corrupt or incompatible snapshot, parse again
+
+    g = Graph()
+    g.parse(str(path), format=format)
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in cache_dir.glob(f"{prefix}*.pickle"):
+            stale.unlink()
+        tmp = snapshot.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(g, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot)
+    except OSError as e:
+        print(f"[WARN] Could not write graph snapshot {snapshot}: {e}")
+    return g
@@ -1,68 +1,22 @@
 import json
 import requests
-import time
+
+from llm_results_store import load_llm_results
+from qid_cache import resolve_qids_cached
 
 filename = "llm_results/results_15_complete.jsonl"
 
 # set of all ingredients
 all_ingredients = set()
 
-# extract ingredients from JSONL file
-with open(filename, 'r', encoding='utf-8') as f:
-    for line in f:
-        data = json.loads(line)
-        try:
-            _x = data['response']['body']['choices'][0]['message']['content']
-            _x = _x.replace("```json", "").replace("```", "")
-            ingredients = json.loads(_x).get('ingredients', [])
-            all_ingredients.update(ingredients)
-        except Exception as e:
-            print(f"Fehler beim Verarbeiten: {e}")
+# extract ingredients of all menu items (parsed once, see llm_results_store.py)
+for item in load_llm_results(filename).items():
+    all_ingredients.update(item["ingredients"] or [])
 
 
-# SPARQL query for exact search
+# exact search, see qid_resolver.py for the (batched) query and qid_cache.py for the cache
 def get_wikidata_qid(ingredient):
-    query = f"""
-    SELECT DISTINCT ?item ?itemLabel WHERE {{
-      SERVICE wikibase:mwapi {{
-        bd:serviceParam wikibase:endpoint "www.wikidata.org" ;
-                        wikibase:api      "EntitySearch" ;
-                        mwapi:search      "{ingredient}" ;   # English label search, indexed
-                        mwapi:language    "en" ;
-                        mwapi:uselang     "en" .
-        ?item wikibase:apiOutputItem mwapi:item .
-      }}
-    
-      VALUES ?foodType {{
-        wd:Q2095        # food
-        wd:Q746549      # food ingredient
-        wd:Q25403900    # food additive
-        # the above classes should be enough
-        # as the classes listed below are all
-        # subclasses of food ingredient or additive
-        wd:Q25403900    # also food ingredient (found via wd:Q504133[Jalapeño])
-        wd:Q11004       # vegetable
-        wd:Q9323487     # edible plant (plant as food)
-        wd:Q207123      # herb
-        wd:Q3088299     # cow's milk cheese
-      }}
-    
-      ?item (wdt:P31|wdt:P279)+ ?foodType.
-    
-      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en,[AUTO_LANGUAGE]" }}
-    }}
-    LIMIT 1
-    """
-    url = "https://query.wikidata.org/sparql"
-    headers = {"Accept": "application/json"}
-    params = {"query": query}
-
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code == 200:
-        results = response.json()["results"]["bindings"]
-        if results:
-            return results[0]["item"]["value"].split("/")[-1]  # extract QID
-    return None
+    return resolve_qids_cached([ingredient], "food").get(ingredient)
 
 
 # SPARQL query for fuzzy search -- not used right now
@@ -116,6 +70,10 @@ if __name__ == "__main__":
     with open("locked_qid_map.json", "r", encoding="utf-8") as f:
         locked_qid_map = json.load(f)
 
+    # get QIDs from the cache or Wikidata, many ingredients per request
+    unlocked = [i for i in all_ingredients if not isinstance(locked_qid_map.get(i), dict)]
+    wikidata_qids = resolve_qids_cached(unlocked, "food")
+
     for ingredient in sorted(all_ingredients):
         entry = locked_qid_map.get(ingredient)
 
@@ -128,8 +86,7 @@ if __name__ == "__main__":
             }
             continue
 
-        # get QID from Wikidata
-        qid = get_wikidata_qid(ingredient)
+        qid = wikidata_qids.get(ingredient)
         if not qid:
             print(f"{ingredient}: ❌ not found")
         else:
@@ -141,8 +98,6 @@ if __name__ == "__main__":
             "locked": False
         }
 
-        time.sleep(1)  # for rate limit
-
     # save mapping to JSON
     with open("ingredient_qid_map.json", "w", encoding="utf-8") as f:
         json.dump(ingredient_qid_map, f, ensure_ascii=False, indent=2)
@@ -1,23 +1,45 @@
-import csv
+import argparse
+import hashlib
 import json
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import re
+import sqlite3
 
 from rdflib import Graph, Literal, Namespace, RDF, RDFS, OWL, XSD, BNode, URIRef
 from rdflib.collection import Collection
 
+from graph_cache import load_graph
+from keyed_jsonl import KeyedJsonl
+from menu_table import count_rows, iter_rows, pizzeria_key
+from source_cache import file_digest
+
 # -------------------------
 # Config
 # -------------------------
 BASE_URI = "http://ontology.daniel-motz.de/ontology#"
 ONTOLOGY_FILE = "../week1/ontology.xml"
 DATA_CSV = "data.csv"
+ROW_COLUMNS = ["name", "address", "city", "country", "postcode", "state",  # columns of DATA_CSV that are integrated
+               "menu item", "item value", "currency", "item description"]
 ING_JSONL = "ingredients.jsonl"
 CITY_QID_MAP = "city_qid_map.json"
 ING_QID_MAP = "ingredient_qid_map.json"
 CLUSTER_JSON = "cluster_labels.json"   # <--- NEW
 OUTPUT_TTL = "pizza_data.ttl"
+OUTPUT_NT = "pizza_data.nt"            # target of the streaming mode
+STREAM_CHUNK_SIZE = 10_000             # triples buffered before a chunk is flushed
+SHARD_DIR = "shards"                   # partial N-Triples of the parallel mode
+SHARD_ROWS = 50_000                    # csv rows per shard
+SKOLEM_AUTHORITY = "http://ontology.daniel-motz.de"
+MANIFEST_DB = "integration_manifest.sqlite"  # row hash -> triples, for incremental runs
+MANIFEST_VERSION = 2                   # layout of MANIFEST_DB; another one is started over
+STORE = "default"                      # rdflib store plugin, e.g. "Oxigraph" (pip install oxrdflib) or "BerkeleyDB"
+STORE_PATH = "pizza_store"             # location of an on-disk store
+STORE_GRAPH = URIRef("http://ontology.daniel-motz.de/pizza_data")
+RESTRICTION_INDEX_JSON = "restriction_index.json"  # cache of RestrictionIndex, keyed by the ontology hash
 FUZZY_SCORE_THRESHOLD = 85
 
 # -------------------------
@@ -37,6 +59,14 @@ try:
     def fuzzy_best(label, candidates):
         match = process.extractOne(label, candidates, scorer=fuzz.WRatio)
         return (match[0], match[1]) if match else (None, 0)
+
+    def fuzzy_best_many(labels, candidates):
+        """Score all labels against all candidates in one multi-threaded batch."""
+        if not labels or not candidates:
+            return [(None, 0)] * len(labels)
+        scores = process.cdist(labels, candidates, scorer=fuzz.WRatio, workers=-1)
+        best = scores.argmax(axis=1)
+        return [(candidates[j], float(scores[i, j])) for i, j in enumerate(best)]
 except Exception:  # rapidfuzz not installed
     from difflib import SequenceMatcher
 
@@ -48,6 +78,9 @@ except Exception:  # rapidfuzz not installed
                 best, score = c, s
         return best, score
 
+    def fuzzy_best_many(labels, candidates):
+        return [fuzzy_best(label, candidates) for label in labels]
+
 
 # -------------------------
 # Helpers
@@ -61,6 +94,16 @@ def slug(s: str) -> str:
     return norm(s).replace(" ", "_").replace("/", "_").replace('"', "").replace("'", "")
 
 
+def content_hash(*parts) -> str:
+    """Short, stable hash of the given values, used for content-derived IRIs."""
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def skolem_iri(name: str) -> URIRef:
+    """Well-known skolem IRI that stands in for a blank node called ``name``."""
+    return BNode(name).skolemize(authority=SKOLEM_AUTHORITY)
+
+
 def rdf_list_members(graph: Graph, node):
     try:
         return list(Collection(graph, node))
@@ -68,84 +111,204 @@ def rdf_list_members(graph: Graph, node):
         return []
 
 
-def extract_canonical_ingredients(ont_graph: Graph, pizza_class_uri) -> set:
-    """Collect ingredient URIs from owl:Restrictions on ONT.enthaeltZutat for a given pizza class."""
-    ingredients = set()
-    for restriction in ont_graph.objects(pizza_class_uri, RDFS.subClassOf):
-        if (restriction, RDF.type, OWL.Restriction) not in ont_graph:
-            continue
-        if (restriction, OWL.onProperty, ONT.enthaeltZutat) not in ont_graph:
-            continue
+class RestrictionIndex:
+    """
+    Ingredients required by owl:Restrictions on ONT.enthaeltZutat, for every class of an ontology.
 
-        # owl:hasValue
-        for ing in ont_graph.objects(restriction, OWL.hasValue):
-            ingredients.add(ing)
-
-        # owl:someValuesFrom / owl:allValuesFrom
-        for pred in (OWL.someValuesFrom, OWL.allValuesFrom):
-            for val in ont_graph.objects(restriction, pred):
-                # unionOf / intersectionOf
-                for coll_pred in (OWL.unionOf, OWL.intersectionOf):
-                    for coll in ont_graph.objects(val, coll_pred):
-                        for member in rdf_list_members(ont_graph, coll):
-                            ingredients.add(member)
-                # direct class / individual
-                if (val, RDF.type, ONT.Zutat) in ont_graph or (val, RDF.type, OWL.NamedIndividual) in ont_graph:
-                    ingredients.add(val)
-    return ingredients
-
-
-def build_pizza_class_index(ont_graph: Graph):
+    Built in one pass over the restrictions and one over rdfs:subClassOf; every list
+    (owl:unionOf / owl:intersectionOf) is resolved once. ``ingredients`` then adds up the
+    restrictions of a class and all its superclasses. The index is plain data and can be
+    cached with ``to_json`` / ``from_json``.
+    """
+
+    def __init__(self, graph: Graph = None, prop: URIRef = ONT.enthaeltZutat):
+        self.direct = {}   # class -> ingredients of its own restrictions
+        self.parents = {}  # class -> named superclasses
+        self._memo = {}
+        if graph is not None:
+            self.index_graph(graph, prop)
+
+    def index_graph(self, graph: Graph, prop: URIRef = ONT.enthaeltZutat):
+        individuals = set(graph.subjects(RDF.type, ONT.Zutat)) | set(graph.subjects(RDF.type, OWL.NamedIndividual))
+        lists = {}
+
+        def list_members(node):
+            if node not in lists:
+                lists[node] = rdf_list_members(graph, node)
+            return lists[node]
+
+        restrictions = {}
+        for restriction in graph.subjects(OWL.onProperty, prop):
+            if (restriction, RDF.type, OWL.Restriction) not in graph:
+                continue
+            ingredients = set(graph.objects(restriction, OWL.hasValue))
+            for pred in (OWL.someValuesFrom, OWL.allValuesFrom):
+                for val in graph.objects(restriction, pred):
+                    # unionOf / intersectionOf
+                    for coll_pred in (OWL.unionOf, OWL.intersectionOf):
+                        for coll in graph.objects(val, coll_pred):
+                            ingredients.update(list_members(coll))
+                    # direct class / individual
+                    if val in individuals:
+                        ingredients.add(val)
+            restrictions[restriction] = ingredients
+
+        for cls, sup in graph.subject_objects(RDFS.subClassOf):
+            if sup in restrictions:
+                self.direct.setdefault(cls, set()).update(restrictions[sup])
+            elif isinstance(sup, URIRef):
+                self.parents.setdefault(cls, set()).add(sup)
+        self._memo.clear()
+        return self
+
+    def ingredients(self, cls, root: URIRef = None) -> frozenset:
+        """Ingredients of ``cls`` including those inherited from superclasses below ``root``."""
+        key = (cls, root)
+        if key not in self._memo:
+            self._memo[key] = frozenset()  # guards against subclass cycles
+            found = set(self.direct.get(cls, ()))
+            for parent in self.parents.get(cls, ()):
+                if parent != root:
+                    found |= self.ingredients(parent, root)
+            self._memo[key] = frozenset(found)
+        return self._memo[key]
+
+    def to_json(self) -> dict:
+        def dump(mapping):
+            return {str(k): sorted(str(v) for v in vs if isinstance(v, URIRef))
+                    for k, vs in mapping.items() if isinstance(k, URIRef)}
+        return {"direct": dump(self.direct), "parents": dump(self.parents)}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "RestrictionIndex":
+        index = cls()
+        index.direct = {URIRef(k): {URIRef(v) for v in vs} for k, vs in data["direct"].items()}
+        index.parents = {URIRef(k): {URIRef(v) for v in vs} for k, vs in data["parents"].items()}
+        return index
+
+
+def load_restriction_index(ont_graph: Graph, ontology_file: str = ONTOLOGY_FILE,
+                           cache_file: str = RESTRICTION_INDEX_JSON) -> RestrictionIndex:
+    """Return the RestrictionIndex of ``ont_graph``, reusing ``cache_file`` while ``ontology_file`` is unchanged."""
+    fingerprint = file_digest(ontology_file)
+    try:
+        cached = json.loads(Path(cache_file).read_text(encoding="utf-8"))
+        if cached.get("fingerprint") == fingerprint:
+            return RestrictionIndex.from_json(cached)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+    index = RestrictionIndex(ont_graph)
+    Path(cache_file).write_text(json.dumps({"fingerprint": fingerprint, **index.to_json()}), encoding="utf-8")
+    return index
+
+
+def build_pizza_class_index(ont_graph: Graph, restrictions: RestrictionIndex = None):
+    """
+    Return (norm label -> pizza class, pizza class -> canonical ingredients) for all
+    (transitive) subclasses of ONT.Pizza.
+    """
+    if restrictions is None:
+        restrictions = RestrictionIndex(ont_graph)
     label_to_uri = {}
     uri_to_ings = {}
 
-    for cls in ont_graph.subjects(RDF.type, OWL.Class):
-        # select subclasses of ONT.Pizza
-        if (cls, RDFS.subClassOf, ONT.Pizza) not in ont_graph:
+    for cls in ont_graph.transitive_subjects(RDFS.subClassOf, ONT.Pizza):
+        if cls == ONT.Pizza or (cls, RDF.type, OWL.Class) not in ont_graph:
             continue
         label = ont_graph.value(cls, RDFS.label) or ont_graph.value(cls, SCHEMA.name)
         if not label:
             continue
         label_norm = norm(str(label))
         label_to_uri[label_norm] = cls
-        uri_to_ings[cls] = extract_canonical_ingredients(ont_graph, cls)
+        # the generic restrictions of ONT.Pizza itself are no canonical ingredients
+        uri_to_ings[cls] = set(restrictions.ingredients(cls, root=ONT.Pizza))
 
     return label_to_uri, uri_to_ings
 
 
-def build_ingredient_lookup(ont_graph: Graph):
-    """Return dict norm_label -> URI for all named ingredients (instances of Zutat or its subclasses)."""
-    lookup = {}
-    # find all individuals with rdf:type ONT:Zutat OR any subclass of Zutat
-    zutat_classes = set([ONT.Zutat]) | set(ont_graph.subjects(RDFS.subClassOf, ONT.Zutat))
-
-    for ind in ont_graph.subjects(RDF.type, OWL.NamedIndividual):
-        types = set(ont_graph.objects(ind, RDF.type))
-        if types & zutat_classes:
-            label = ont_graph.value(ind, RDFS.label) or ont_graph.value(ind, SCHEMA.name) or ind.split("#")[-1]
-            lookup[norm(str(label))] = ind
-    # catch individuals without explicit NamedIndividual type
-    for ind in ont_graph.subjects(RDF.type, None):
-        if ind in lookup:  # already added
-            continue
-        types = set(ont_graph.objects(ind, RDF.type))
-        if types & zutat_classes:
-            label = ont_graph.value(ind, RDFS.label) or ont_graph.value(ind, SCHEMA.name) or ind.split("#")[-1]
-            lookup[norm(str(label))] = ind
-    return lookup
-
-
-def decide_ingredients_for_item(menu_label: str, jsonl_ings: list, label_to_uri, uri_to_ings):
-    if not label_to_uri:
-        return False, None, jsonl_ings
-    best_label, score = fuzzy_best(norm(menu_label), list(label_to_uri.keys()))
-    if best_label and score >= FUZZY_SCORE_THRESHOLD:
-        cls = label_to_uri[best_label]
-        return True, cls, uri_to_ings.get(cls, set())
+class IngredientIndex(dict):
+    """
+    Mapping norm_label -> URI for all named ingredients, i.e. instances of Zutat or of any
+    (transitive) subclass of it.
+
+    The index is filled in a single pass over the rdf:type triples of the Zutat classes and
+    is updated in place by ``ensure_ingredient_node``, so it never needs to be rebuilt.
+    """
+
+    def __init__(self, graph: Graph = None):
+        super().__init__()
+        self.classes = {ONT.Zutat}
+        if graph is not None:
+            self.index_graph(graph)
+
+    def index_graph(self, graph: Graph):
+        """Add all ingredient individuals of ``graph``; existing entries win over new ones."""
+        self.classes |= set(graph.transitive_subjects(RDFS.subClassOf, ONT.Zutat))
+        for cls in sorted(self.classes):  # sorted, so ties between equal labels are deterministic
+            for ind in graph.subjects(RDF.type, cls):
+                label = graph.value(ind, RDFS.label) or graph.value(ind, SCHEMA.name) or ind.split("#")[-1]
+                self.setdefault(norm(str(label)), ind)
+        return self
+
+
+def build_ingredient_lookup(ont_graph: Graph) -> IngredientIndex:
+    """Return the ingredient index (norm_label -> URI) of ``ont_graph``."""
+    return IngredientIndex(ont_graph)
+
+
+class PizzaClassMatcher:
+    """
+    Fuzzy matcher from menu labels to ontology pizza classes, built once from
+    ``build_pizza_class_index``. Results are memoized per normalised label, and
+    ``prime`` scores many distinct labels in a single batch.
+    """
+
+    def __init__(self, label_to_uri: dict, uri_to_ings: dict, threshold: float = FUZZY_SCORE_THRESHOLD):
+        self.label_to_uri = label_to_uri
+        self.uri_to_ings = uri_to_ings
+        self.threshold = threshold
+        self.candidates = list(label_to_uri.keys())
+        self._cache = {}  # norm label -> class URI or None
+
+    def prime(self, menu_labels):
+        """Batch-score every not yet seen label in ``menu_labels``."""
+        todo = sorted({norm(label) for label in menu_labels} - self._cache.keys())
+        for label, (best_label, score) in zip(todo, fuzzy_best_many(todo, self.candidates)):
+            self._remember(label, best_label, score)
+
+    def match(self, menu_label: str):
+        """Return the ontology pizza class for ``menu_label``, or None below the threshold."""
+        label = norm(menu_label)
+        if label not in self._cache:
+            best_label, score = fuzzy_best(label, self.candidates) if self.candidates else (None, 0)
+            self._remember(label, best_label, score)
+        return self._cache[label]
+
+    def _remember(self, label, best_label, score):
+        self._cache[label] = self.label_to_uri[best_label] if best_label and score >= self.threshold else None
+
+
+def decide_ingredients_for_item(menu_label: str, jsonl_ings: list, matcher: PizzaClassMatcher):
+    cls = matcher.match(menu_label)
+    if cls is not None:
+        return True, cls, matcher.uri_to_ings.get(cls, set())
     return False, None, jsonl_ings
 
 
-def ensure_ingredient_node(g: Graph, ont_graph: Graph, name_norm: str, ing_qid_map: dict, ont_lookup: dict):
+def iter_menu_labels(jsonl_path: str):
+    """Yield the pizza names of all LLM results in ``jsonl_path`` (used to prime the matcher)."""
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for pizza in data if isinstance(data, list) else [data]:
+                if pizza.get("is_pizza", False) and pizza.get("name"):
+                    yield pizza["name"]
+
+
+def ensure_ingredient_node(g: Graph, ont_graph: Graph, name_norm: str, ing_qid_map: dict, ont_lookup: IngredientIndex):
     """Reuse ontology ingredient individual if present, else mint new one in ONT namespace."""
     if name_norm in ont_lookup:
         return ont_lookup[name_norm]
@@ -158,11 +321,118 @@ def ensure_ingredient_node(g: Graph, ont_graph: Graph, name_norm: str, ing_qid_m
         g.add((ing_uri, RDFS.label, Literal(name_norm)))
         if name_norm in ing_qid_map and ing_qid_map[name_norm].get("qid"):
             g.add((ing_uri, OWL.sameAs, WD[ing_qid_map[name_norm]["qid"]]))
-    # update lookup to avoid dupes later
+    # update the index in place to avoid dupes later
     ont_lookup[name_norm] = ing_uri
     return ing_uri
 
 
+# -------------------------
+# Streaming output
+# -------------------------
+
+class NTriplesStreamWriter:
+    """
+    Write-only stand-in for the output Graph that appends N-Triples chunks to a file.
+
+    Membership tests (``triple in writer``) are answered from the in-memory TBox graph
+    and the current chunk, which is all the integration code needs to avoid re-minting
+    nodes. Triples of already flushed chunks are forgotten, so memory stays flat;
+    the rare duplicate that results is harmless, as RDF loaders collapse them.
+    """
+
+    def __init__(self, path: str, tbox: Graph = None, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.tbox = tbox if tbox is not None else Graph()
+        self.chunk_size = chunk_size
+        self.chunk = Graph()
+        self.written = 0
+        self._fh = open(path, "w", encoding="utf-8")
+        # the ontology, cluster TBox and minted ingredients go first
+        self._fh.write(self.tbox.serialize(format="nt"))
+        self.written += len(self.tbox)
+
+    def add(self, triple):
+        self.chunk.add(triple)
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def __contains__(self, triple):
+        return triple in self.chunk or triple in self.tbox
+
+    def flush(self):
+        if not len(self.chunk):
+            return
+        self._fh.write(self.chunk.serialize(format="nt"))
+        self.written += len(self.chunk)
+        self.chunk = Graph()
+
+    def close(self):
+        self.flush()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------
+# On-disk store
+# -------------------------
+
+def open_output_graph(store: str = STORE, path: str = STORE_PATH) -> Graph:
+    """
+    Return an empty output graph, either in memory (``store="default"``) or in the
+    on-disk rdflib store plugin ``store`` located at ``path``.
+    """
+    if store == "default":
+        return Graph()
+    g = Graph(store=store, identifier=STORE_GRAPH)
+    g.open(path, create=True)
+    g.remove((None, None, None))  # the output is always rebuilt from scratch
+    return g
+
+
+class BulkStoreWriter:
+    """
+    Collects triples for a store-backed Graph and inserts them in ``addN`` batches.
+
+    De-duplication is left to the store; membership tests see the store and the
+    pending batch.
+    """
+
+    def __init__(self, graph: Graph, batch_size: int = STREAM_CHUNK_SIZE):
+        self.graph = graph
+        self.batch_size = batch_size
+        self.pending = set()
+
+    def add(self, triple):
+        self.pending.add(triple)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def __contains__(self, triple):
+        return triple in self.pending or triple in self.graph
+
+    def flush(self):
+        self.graph.addN((s, p, o, self.graph) for s, p, o in self.pending)
+        self.pending = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def export_ntriples(g: Graph, path: str) -> int:
+    """Stream all triples of ``g`` to an N-Triples file without materialising them."""
+    with NTriplesStreamWriter(path) as writer:
+        for t in g:
+            writer.add(t)
+    return writer.written
+
+
 # -------------------------
 # Cluster integration
 # -------------------------
@@ -170,7 +440,7 @@ def ensure_ingredient_node(g: Graph, ont_graph: Graph, name_norm: str, ing_qid_m
 def integrate_clusters_into_tbox(
     g: Graph,
     ont_graph: Graph,
-    ingredient_lookup: dict,
+    ingredient_lookup: IngredientIndex,
     ing_qid_map: dict,
     cluster_file: str
 ):
@@ -262,35 +532,383 @@ def integrate_clusters_into_tbox(
                 g.add((cluster_uri, OWL.equivalentClass, anon))
 
 
+# -------------------------
+# Row integration
+# -------------------------
+
+def iter_row_pizzas(start: int = 0, stop: int = None, offsets: dict = None):
+    """
+    Yield (row_index, csv_row, pizzas) for the rows [start, stop) of DATA_CSV, joined with
+    ING_JSONL by custom_id (the row index). Rows without a parseable result are skipped.
+    ``offsets`` (see ``KeyedJsonl.subset``) saves loading the whole index of ING_JSONL.
+    """
+    with KeyedJsonl(ING_JSONL, offsets) as results:
+        for i, row in enumerate(iter_rows(DATA_CSV, ROW_COLUMNS, start, stop), start=start):
+            pizza_data = results.get(str(i))
+            if pizza_data is None:
+                continue
+
+            yield i, row, pizza_data if isinstance(pizza_data, list) else [pizza_data]
+
+
+def integrate_rows(g, ont_graph: Graph, cities_map: dict, ing_qid_map: dict,
+                   matcher: PizzaClassMatcher, ingredient_lookup: IngredientIndex,
+                   rows=None, deterministic_iris: bool = False):
+    """
+    Add pizzerias, menu items and ingredients for ``rows`` to ``g``.
+
+    ``rows`` yields (row_id, csv_row, pizzas) and defaults to all of DATA_CSV / ING_JSONL.
+    By default pizzerias and menu items are numbered by running counters and addresses are
+    blank nodes. With ``deterministic_iris`` the IRIs are derived from the content instead
+    (hash of the pizzeria key, row id, skolemized address), so that independently
+    integrated rows agree on them.
+    """
+    pizzerias = {}
+    pizza_count = 0
+
+    for i, row, pizzas in rows if rows is not None else iter_row_pizzas():
+        for k, pizza in enumerate(pizzas):
+            if not pizza.get("is_pizza", False):
+                continue
+
+            # --- Pizzeria node ---
+            pizz_key = pizzeria_key(row)
+            if pizz_key not in pizzerias:
+                if deterministic_iris:
+                    key_hash = content_hash(*pizz_key)
+                    pizz_uri = ONT[f"Pizzeria_{key_hash}"]
+                    address = skolem_iri(f"Address_{key_hash}")
+                else:
+                    pizz_uri = ONT[f"Pizzeria_{len(pizzerias)}"]
+                    address = BNode()
+                pizzerias[pizz_key] = pizz_uri
+
+                g.add((pizz_uri, RDF.type, ONT.Pizzeria))
+                g.add((pizz_uri, RDF.type, SCHEMA.FoodEstablishment))
+                g.add((pizz_uri, RDFS.label, Literal(row["name"])))
+                g.add((pizz_uri, SCHEMA.name, Literal(row["name"])))
+
+                g.add((address, RDF.type, SCHEMA.PostalAddress))
+                g.add((address, SCHEMA.streetAddress, Literal(row.get("address"))))
+
+                addr_map = [
+                    ("state", SCHEMA.addressRegion),
+                    ("postcode", SCHEMA.postalCode),
+                    ("country", SCHEMA.addressCountry),
+                    ("city", SCHEMA.addressLocality),
+                ]
+                for key, pred in addr_map:
+                    val = row.get(key)
+                    if val:
+                        g.add((address, pred, Literal(val)))
+
+                g.add((pizz_uri, SCHEMA.address, address))
+
+                # the city will get asserted separately (because this makes querying easier and more conclusive)
+                city = row.get("city")
+                if city:
+                    city_data = cities_map.get(city, {})
+                    if city_data.get("qid"):
+                        g.add((address, SCHEMA.containedInPlace, WD[city_data["qid"]]))
+
+            # --- Menu item / pizza individual ---
+            pizza_name = pizza.get("name", row["menu item"]) or "Pizza"
+            slug = pizza_name.replace(" ", "_").replace('"', "").replace("'", "")
+            if deterministic_iris:
+                menu_item_uri = ONT[f"MenuItem_{slug}_{i}_{k}"]
+            else:
+                menu_item_uri = ONT[f"MenuItem_{slug}_{pizza_count}"]
+                pizza_count += 1
+
+            g.add((menu_item_uri, RDF.type, SCHEMA.MenuItem))
+            g.add((menu_item_uri, RDF.type, ONT.Pizza))
+            g.add((menu_item_uri, RDFS.label, Literal(pizza_name)))
+            g.add((menu_item_uri, SCHEMA.name, Literal(pizza_name)))
+
+            desc = row.get("item description")
+            if desc:
+                g.add((menu_item_uri, RDFS.comment, Literal(desc)))
+                g.add((menu_item_uri, SCHEMA.description, Literal(desc)))
+
+            # price
+            try:
+                price_val = float(row.get("item value"))
+            except (TypeError, ValueError):
+                price_val = None
+            if price_val is not None and price_val != 0:
+                g.add((menu_item_uri, ONT.preis, Literal(str(price_val), datatype=XSD.decimal)))
+                g.add((menu_item_uri, SCHEMA.priceCurrency, Literal(row.get("currency"))))
+
+            # pizzeria link
+            g.add((menu_item_uri, ONT.gehoertZuPizzeria, pizzerias[pizz_key]))
+
+            # --- Ingredient decision ---
+            use_ont, class_uri, ing_candidates = decide_ingredients_for_item(
+                pizza_name, pizza.get("ingredients", []), matcher
+            )
+
+            if use_ont:
+                g.add((menu_item_uri, RDF.type, class_uri))
+                for ing_uri in ing_candidates:
+                    g.add((menu_item_uri, ONT.enthaeltZutat, ing_uri))
+            else:
+                for ing_name in pizza.get("ingredients", []):
+                    ing_uri = ensure_ingredient_node(
+                        g, ont_graph, norm(ing_name), ing_qid_map, ingredient_lookup
+                    )
+                    g.add((menu_item_uri, ONT.enthaeltZutat, ing_uri))
+
+
+# -------------------------
+# Parallel integration
+# -------------------------
+
+_shard_context = None
+
+
+def _init_shard_worker(context):
+    global _shard_context
+    _shard_context = context
+
+
+def integrate_shard(shard) -> Path:
+    """Integrate one (index, start, stop, offsets) row range into a sorted N-Triples file in SHARD_DIR."""
+    index, start, stop, offsets = shard
+    cities_map, ing_qid_map, matcher, ingredient_lookup = _shard_context
+
+    g = Graph()
+    integrate_rows(g, None, cities_map, ing_qid_map, matcher, ingredient_lookup,
+                   rows=iter_row_pizzas(start, stop, offsets), deterministic_iris=True)
+
+    path = Path(SHARD_DIR) / f"shard_{index:05d}.nt"
+    lines = g.serialize(format="nt").splitlines(keepends=True)
+    path.write_text("".join(sorted(lines)), encoding="utf-8")
+    return path
+
+
+def merge_shards(tbox: Graph, shard_paths: list, output_path: str) -> int:
+    """
+    Write the TBox followed by all shards (in shard order) to ``output_path``.
+
+    Menu item triples are unique per row. All other lines (pizzerias that occur in several
+    shards, their addresses, newly minted ingredients) are de-duplicated, which only needs
+    memory per distinct entity. Returns the number of written triples.
+    """
+    menu_item_prefix = f"<{ONT['MenuItem_']}"
+    seen = set()
+    written = len(tbox)
+    with open(output_path, "w", encoding="utf-8") as out:
+        out.write(tbox.serialize(format="nt"))
+        for path in shard_paths:
+            with open(path, "r", encoding="utf-8") as shard:
+                for line in shard:
+                    if not line.startswith(menu_item_prefix):
+                        if line in seen:
+                            continue
+                        seen.add(line)
+                    out.write(line)
+                    written += 1
+            path.unlink()
+    return written
+
+
+# -------------------------
+# Incremental integration
+# -------------------------
+
+def row_content_hash(row: dict, pizzas: list) -> str:
+    """Hash of a csv row together with its LLM result."""
+    return content_hash(*row.values(), json.dumps(pizzas, sort_keys=True))
+
+
+def integrate_row_ntriples(row_id, row: dict, pizzas: list, cities_map: dict, ing_qid_map: dict,
+                           matcher: PizzaClassMatcher, ingredient_lookup: IngredientIndex) -> list:
+    """
+    Integrate a single row with content-derived IRIs and return its sorted N-Triples lines.
+
+    The row declares the pizzeria and every minted ingredient it uses itself, so its
+    triples stay self-contained (``ingredient_lookup`` is not modified).
+    """
+    g = Graph()
+    integrate_rows(g, None, cities_map, ing_qid_map, matcher, ChainMap({}, ingredient_lookup),
+                   rows=[(row_id, row, pizzas)], deterministic_iris=True)
+    return sorted(g.serialize(format="nt").splitlines())
+
+
+def input_fingerprint() -> str:
+    """Hash of every input besides the rows; if it changes, all cached row triples are stale."""
+    return content_hash(*(file_digest(p) for p in (ONTOLOGY_FILE, CLUSTER_JSON, CITY_QID_MAP, ING_QID_MAP)))
+
+
+def open_manifest(path: str = MANIFEST_DB) -> sqlite3.Connection:
+    """
+    The manifest of the incremental mode: the N-Triples of every row (by row hash) with the
+    position of its own lines in the output, the shared lines of the output (pizzerias,
+    addresses, minted ingredients) with their position and the number of rows using them, and
+    the input fingerprint, output size and erased bytes of the last run.
+    """
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != MANIFEST_VERSION:
+        # manifest of an older layout: start over (the next run rewrites the output)
+        conn.executescript("DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS rows; DROP TABLE IF EXISTS shared;")
+        conn.execute(f"PRAGMA user_version = {MANIFEST_VERSION}")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS rows (row_id TEXT PRIMARY KEY, triples TEXT NOT NULL, offset INTEGER, length INTEGER);
+        CREATE TABLE IF NOT EXISTS shared (line TEXT PRIMARY KEY, refs INTEGER NOT NULL, offset INTEGER NOT NULL);
+    """)
+    return conn
+
+
+def integrate_incremental(tbox: Graph, cities_map: dict, ing_qid_map: dict, matcher: PizzaClassMatcher,
+                          ingredient_lookup: IngredientIndex, manifest_path: str = MANIFEST_DB,
+                          output_path: str = OUTPUT_NT) -> dict:
+    """
+    Re-integrate only the rows whose content changed since the last run.
+
+    The manifest maps the content hash of every row (csv values + LLM result) to the
+    N-Triples it produced. Rows found in the manifest are skipped; new or changed rows are
+    integrated on their own (with content-derived IRIs) and appended to the output. The lines
+    of rows that disappeared (a changed row is a removed one plus an added one) are erased in
+    place, overwritten by blanks, which N-Triples ignores; a shared line is erased with the last
+    row using it. So a delta costs output I/O in its own size (the csv rows are still read and
+    hashed to find it). The output is rewritten (the TBox plus the triples of all rows,
+    streamed from the manifest) only if the other inputs changed, the output is not the one of
+    the last run, or more than half of it would be erased bytes.
+    Returns counts of added, removed and unchanged rows.
+    """
+    fingerprint = input_fingerprint()
+    conn = open_manifest(manifest_path)
+    menu_item_prefix = f"<{ONT['MenuItem_']}"
+    erased = 0
+
+    def emit_row(out, row_id: str):
+        # menu item lines are unique per row and written as one block, all others once
+        # for every row using them
+        own = []
+        for line in conn.execute("SELECT triples FROM rows WHERE row_id = ?", (row_id,)).fetchone()[0].splitlines():
+            if line.startswith(menu_item_prefix):
+                own.append(line)
+            elif not conn.execute("UPDATE shared SET refs = refs + 1 WHERE line = ?", (line,)).rowcount:
+                conn.execute("INSERT INTO shared (line, refs, offset) VALUES (?, 1, ?)", (line, out.tell()))
+                out.write(line.encode("utf-8") + b"\n")
+        block = "".join(line + "\n" for line in own).encode("utf-8")
+        conn.execute("UPDATE rows SET offset = ?, length = ? WHERE row_id = ?", (out.tell(), len(block), row_id))
+        out.write(block)
+
+    def erase(out, offset: int, length: int):
+        nonlocal erased
+        if length:
+            out.seek(offset)
+            out.write(b" " * (length - 1) + b"\n")
+            erased += length
+
+    def retract_row(out, row_id: str):
+        triples, offset, length = conn.execute(
+            "SELECT triples, offset, length FROM rows WHERE row_id = ?", (row_id,)).fetchone()
+        erase(out, offset, length)
+        for line in triples.splitlines():
+            if line.startswith(menu_item_prefix):
+                continue
+            refs, line_offset = conn.execute("SELECT refs, offset FROM shared WHERE line = ?", (line,)).fetchone()
+            if refs > 1:
+                conn.execute("UPDATE shared SET refs = refs - 1 WHERE line = ?", (line,))
+            else:
+                erase(out, line_offset, len(line.encode("utf-8")) + 1)
+                conn.execute("DELETE FROM shared WHERE line = ?", (line,))
+
+    # one transaction: an interrupted run leaves the manifest of the last complete run
+    with conn:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if meta.get("fingerprint") != fingerprint:
+            conn.execute("DELETE FROM rows")
+        output = Path(output_path)
+        output_current = (meta.get("fingerprint") == fingerprint and output.exists()
+                          and meta.get("output_size") == str(output.stat().st_size))
+
+        row_ids = set()
+        added = []
+        for _, row, pizzas in iter_row_pizzas():
+            row_hash = row_content_hash(row, pizzas)
+            # identical duplicate rows are kept apart by their occurrence
+            row_id, n = row_hash, 1
+            while row_id in row_ids:
+                n += 1
+                row_id = f"{row_hash}_{n}"
+            row_ids.add(row_id)
+
+            if conn.execute("SELECT 1 FROM rows WHERE row_id = ?", (row_id,)).fetchone():
+                continue
+            lines = integrate_row_ntriples(row_id, row, pizzas, cities_map, ing_qid_map, matcher, ingredient_lookup)
+            conn.execute("INSERT INTO rows (row_id, triples) VALUES (?, ?)", (row_id, "\n".join(lines)))
+            added.append(row_id)
+
+        removed = [row_id for (row_id,) in conn.execute("SELECT row_id FROM rows") if row_id not in row_ids]
+
+        rewrite = not output_current
+        if output_current:
+            erased = int(meta.get("erased", 0))
+            removed_bytes = sum(conn.execute("SELECT length FROM rows WHERE row_id = ?", (row_id,)).fetchone()[0]
+                                for row_id in removed)
+            rewrite = 2 * (erased + removed_bytes) > output.stat().st_size
+        if rewrite:
+            conn.executemany("DELETE FROM rows WHERE row_id = ?", ((row_id,) for row_id in removed))
+            conn.execute("DELETE FROM shared")
+            erased = 0
+            with open(output, "wb") as out:
+                out.write(tbox.serialize(format="nt").encode("utf-8"))
+                for (row_id,) in conn.execute("SELECT row_id FROM rows ORDER BY rowid").fetchall():
+                    emit_row(out, row_id)
+        else:
+            with open(output, "r+b") as out:
+                for row_id in removed:
+                    retract_row(out, row_id)
+                conn.executemany("DELETE FROM rows WHERE row_id = ?", ((row_id,) for row_id in removed))
+                out.seek(0, 2)
+                for row_id in added:
+                    emit_row(out, row_id)
+
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [("fingerprint", fingerprint), ("output_size", str(output.stat().st_size)),
+                          ("erased", str(erased))])
+    conn.close()
+    return {"added": len(added), "removed": len(removed), "unchanged": len(row_ids) - len(added)}
+
+
 # -------------------------
 # MAIN
 # -------------------------
 
-def main():
+def prepare_integration(store: str = STORE):
+    """
+    Load the mappings and the ontology, build the indexes and add the cluster TBox.
+
+    Returns (g, ont_graph, cities_map, ing_qid_map, matcher, ingredient_lookup), where ``g``
+    is the output graph holding the ontology and the TBox.
+    """
     # Load mappings
     cities_map = json.loads(Path(CITY_QID_MAP).read_text(encoding="utf-8"))
     ing_qid_map = json.loads(Path(ING_QID_MAP).read_text(encoding="utf-8"))
 
     # Master output graph
-    g = Graph()
+    g = open_output_graph(store)
     g.bind("", BASE_URI)
     g.bind("owl", OWL)
     g.bind("rdfs", RDFS)
     g.bind("schema", SCHEMA)
 
-    # Load ontology
-    ont_graph = Graph()
-    ont_graph.parse(ONTOLOGY_FILE)
+    # Load ontology (from the parse cache while ontology.xml is unchanged)
+    ont_graph = load_graph(ONTOLOGY_FILE)
 
     # Copy ontology triples into output graph
-    for t in ont_graph:
-        g.add(t)
+    g.addN((s, p, o, g) for s, p, o in ont_graph)
 
     # Index ontology data
-    label_to_uri, uri_to_ings = build_pizza_class_index(ont_graph)
+    label_to_uri, uri_to_ings = build_pizza_class_index(ont_graph, load_restriction_index(ont_graph))
+    matcher = PizzaClassMatcher(label_to_uri, uri_to_ings)
     ingredient_lookup = build_ingredient_lookup(ont_graph)
 
-    # --- integrate clusters into TBox before adding pizzas ---
+    # --- integrate clusters into TBox before adding pizzas (this extends ingredient_lookup in place) ---
     integrate_clusters_into_tbox(
         g=g,
         ont_graph=ont_graph,
@@ -299,108 +917,66 @@ def main():
         cluster_file=CLUSTER_JSON
     )
 
-    # Rebuild lookup after adding possible new ingredients
-    ingredient_lookup = build_ingredient_lookup(g)
-
-    pizzerias = {}
-    pizza_count = 0
-
-    with open(DATA_CSV, "r", encoding="utf-8") as csv_file, open(ING_JSONL, "r", encoding="utf-8") as jsonl_file:
-        csv_reader = csv.DictReader(csv_file)
-        for i, row in enumerate(csv_reader):
-            json_line = jsonl_file.readline().strip()
-            if not json_line:
-                continue
-            try:
-                pizza_data = json.loads(json_line)
-            except json.JSONDecodeError:
-                continue
+    return g, ont_graph, cities_map, ing_qid_map, matcher, ingredient_lookup
 
-            pizzas = pizza_data if isinstance(pizza_data, list) else [pizza_data]
 
-            for pizza in pizzas:
-                if not pizza.get("is_pizza", False):
-                    continue
-
-                # --- Pizzeria node ---
-                pizz_key = (row["name"], row["address"], row["city"], row["state"], row["country"])
-                if pizz_key not in pizzerias:
-                    pizz_uri = ONT[f"Pizzeria_{len(pizzerias)}"]
-                    pizzerias[pizz_key] = pizz_uri
+def main(stream: bool = False, workers: int = 0, shard_rows: int = SHARD_ROWS, incremental: bool = False,
+         store: str = STORE):
+    """
+    Build pizza_data.ttl from the ontology, the cluster TBox and the tabular data.
+
+    With ``stream=True`` the row triples are written to OUTPUT_NT chunk by chunk
+    instead of being collected in one Graph, so memory does not grow with data.csv.
+    With ``workers > 0`` the rows are split into shards of ``shard_rows`` rows that are
+    integrated by a process pool (with content-derived IRIs) and merged into OUTPUT_NT.
+    With ``incremental=True`` only rows changed since the last run (see MANIFEST_DB)
+    are integrated again: new rows are appended to OUTPUT_NT, removed ones erased in place.
+    With an on-disk ``store`` plugin the output graph lives in STORE_PATH instead of
+    memory, is filled in bulk batches and exported to OUTPUT_NT.
+    The modes exclude each other; the store is only opened in the store mode.
+    """
+    if sum((stream, bool(workers), incremental, store != "default")) > 1:
+        raise ValueError("stream, workers, incremental and store are exclusive modes")
+    g, ont_graph, cities_map, ing_qid_map, matcher, ingredient_lookup = prepare_integration(store)
+    matcher.prime(iter_menu_labels(ING_JSONL))
+
+    if incremental:
+        stats = integrate_incremental(g, cities_map, ing_qid_map, matcher, ingredient_lookup)
+        print(f"Wrote {OUTPUT_NT} ({stats['added']} rows added, {stats['removed']} removed, "
+              f"{stats['unchanged']} unchanged)")
+        return
 
-                    g.add((pizz_uri, RDF.type, ONT.Pizzeria))
-                    g.add((pizz_uri, RDF.type, SCHEMA.FoodEstablishment))
-                    g.add((pizz_uri, RDFS.label, Literal(row["name"])))
-                    g.add((pizz_uri, SCHEMA.name, Literal(row["name"])))
+    if workers:
+        # every shard gets its own row range and the ING_JSONL offsets of these rows only;
+        # counting the rows also writes the csv snapshot the workers then read their range from
+        with KeyedJsonl(ING_JSONL) as results:
+            shards = [(k, start, start + shard_rows, results.subset(map(str, range(start, start + shard_rows))))
+                      for k, start in enumerate(range(0, count_rows(DATA_CSV), shard_rows))]
+        Path(SHARD_DIR).mkdir(exist_ok=True)
+        context = (cities_map, ing_qid_map, matcher, ingredient_lookup)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker, initargs=(context,)) as pool:
+            shard_paths = list(pool.map(integrate_shard, shards))
+        written = merge_shards(g, shard_paths, OUTPUT_NT)
+        print(f"Wrote {OUTPUT_NT} ({written} triples from {len(shards)} shards)")
+        return
 
-                    address = BNode()
-                    g.add((address, RDF.type, SCHEMA.PostalAddress))
-                    g.add((address, SCHEMA.streetAddress, Literal(row.get("address"))))
-
-                    addr_map = [
-                        ("state", SCHEMA.addressRegion),
-                        ("postcode", SCHEMA.postalCode),
-                        ("country", SCHEMA.addressCountry),
-                        ("city", SCHEMA.addressLocality),
-                    ]
-                    for key, pred in addr_map:
-                        val = row.get(key)
-                        if val:
-                            g.add((address, pred, Literal(val)))
-
-                    g.add((pizz_uri, SCHEMA.address, address))
-
-                    # the city will get asserted separately (because this makes querying easier and more conclusive)
-                    city = row.get("city")
-                    if city:
-                        city_data = cities_map.get(city, {})
-                        if city_data.get("qid"):
-                            g.add((address, SCHEMA.containedInPlace, WD[city_data["qid"]]))
-
-                # --- Menu item / pizza individual ---
-                pizza_name = pizza.get("name", row["menu item"]) or "Pizza"
-                slug = pizza_name.replace(" ", "_").replace('"', "").replace("'", "")
-                menu_item_uri = ONT[f"MenuItem_{slug}_{pizza_count}"]
-                pizza_count += 1
+    if store != "default":
+        try:
+            with BulkStoreWriter(g) as writer:
+                integrate_rows(writer, ont_graph, cities_map, ing_qid_map, matcher, ingredient_lookup)
+            written = export_ntriples(g, OUTPUT_NT)
+        finally:
+            g.close()
+        print(f"Wrote {OUTPUT_NT} ({written} triples, store: {store} at {STORE_PATH})")
+        return
 
-                g.add((menu_item_uri, RDF.type, SCHEMA.MenuItem))
-                g.add((menu_item_uri, RDF.type, ONT.Pizza))
-                g.add((menu_item_uri, RDFS.label, Literal(pizza_name)))
-                g.add((menu_item_uri, SCHEMA.name, Literal(pizza_name)))
-
-                desc = row.get("item description")
-                if desc:
-                    g.add((menu_item_uri, RDFS.comment, Literal(desc)))
-                    g.add((menu_item_uri, SCHEMA.description, Literal(desc)))
-
-                # price
-                try:
-                    price_val = float(row.get("item value"))
-                except (TypeError, ValueError):
-                    price_val = None
-                if price_val is not None and price_val != 0:
-                    g.add((menu_item_uri, ONT.preis, Literal(str(price_val), datatype=XSD.decimal)))
-                    g.add((menu_item_uri, SCHEMA.priceCurrency, Literal(row.get("currency"))))
-
-                # pizzeria link
-                g.add((menu_item_uri, ONT.gehoertZuPizzeria, pizzerias[pizz_key]))
-
-                # --- Ingredient decision ---
-                use_ont, class_uri, ing_candidates = decide_ingredients_for_item(
-                    pizza_name, pizza.get("ingredients", []), label_to_uri, uri_to_ings
-                )
-
-                if use_ont:
-                    g.add((menu_item_uri, RDF.type, class_uri))
-                    for ing_uri in ing_candidates:
-                        g.add((menu_item_uri, ONT.enthaeltZutat, ing_uri))
-                else:
-                    for ing_name in pizza.get("ingredients", []):
-                        ing_uri = ensure_ingredient_node(
-                            g, ont_graph, norm(ing_name), ing_qid_map, ingredient_lookup
-                        )
-                        g.add((menu_item_uri, ONT.enthaeltZutat, ing_uri))
+    if stream:
+        with NTriplesStreamWriter(OUTPUT_NT, tbox=g) as writer:
+            integrate_rows(writer, ont_graph, cities_map, ing_qid_map, matcher, ingredient_lookup)
+        print(f"Wrote {OUTPUT_NT} ({writer.written} triples)")
+        return
 
+    integrate_rows(g, ont_graph, cities_map, ing_qid_map, matcher, ingredient_lookup)
     g.serialize(OUTPUT_TTL, format="turtle")
 
     with open(OUTPUT_TTL, 'r+', encoding='utf-8') as f:
@@ -426,4 +1002,17 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Integrate data.csv with the pizza ontology.")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--stream", action="store_true",
+                       help=f"stream N-Triples chunks to {OUTPUT_NT} instead of building {OUTPUT_TTL} in memory")
+    modes.add_argument("--workers", type=int, default=0,
+                       help=f"integrate shards of data.csv in parallel processes and merge them into {OUTPUT_NT}")
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS, help="csv rows per shard (with --workers)")
+    modes.add_argument("--incremental", action="store_true",
+                       help=f"only re-integrate rows that changed since the last run (tracked in {MANIFEST_DB})")
+    modes.add_argument("--store", default=STORE,
+                       help=f"rdflib store plugin for the output graph, e.g. Oxigraph (kept in {STORE_PATH})")
+    args = parser.parse_args()
+    main(stream=args.stream, workers=args.workers, shard_rows=args.shard_rows, incremental=args.incremental,
+         store=args.store)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Warm integration service.
+
+Parses the ontology, builds the pizza-class and ingredient indexes and loads the QID maps
+once, then integrates batches of rows posted over HTTP. Small updates therefore do not pay
+the start-up cost of integrate_tabular_data_with_ontology.py.
+
+Usage:
+    python integration_service.py --port 8765 --output pizza_data_live.nt
+
+    POST /integrate           body: {"rows": [{"row": {<data.csv columns>}, "pizzas": <LLM result>}, …]}
+    POST /integrate?append=1  same, and also append the triples to --output
+    GET  /health
+
+A row may carry an "id"; otherwise its IRIs are derived from the hash of its content.
+The response is N-Triples (pizzerias, menu items and newly minted ingredients of the batch).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from integrate_tabular_data_with_ontology import (
+    integrate_row_ntriples,
+    prepare_integration,
+    row_content_hash,
+)
+
+HOST = "127.0.0.1"
+PORT = 8765
+OUTPUT_NT = "pizza_data_live.nt"
+
+
+class IntegrationService:
+    """Holds the warm integration context and turns posted rows into N-Triples."""
+
+    def __init__(self, output_path: str = OUTPUT_NT):
+        _, _, self.cities_map, self.ing_qid_map, self.matcher, self.ingredient_lookup = prepare_integration()
+        self.output_path = output_path
+        self.rows_integrated = 0
+        self._lock = threading.Lock()
+
+    def integrate(self, rows: list[dict], append: bool = False) -> list[str]:
+        lines: list[str] = []
+        seen: set[str] = set()
+        with self._lock:
+            for entry in rows:
+                row, pizzas = entry["row"], entry.get("pizzas", [])
+                pizzas = pizzas if isinstance(pizzas, list) else [pizzas]
+                row_id = entry.get("id") or row_content_hash(row, pizzas)
+                for line in integrate_row_ntriples(row_id, row, pizzas, self.cities_map, self.ing_qid_map,
+                                                   self.matcher, self.ingredient_lookup):
+                    if line not in seen:
+                        seen.add(line)
+                        lines.append(line)
+            self.rows_integrated += len(rows)
+            if append and lines:
+                with open(self.output_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+        return lines
+
+
+def make_handler(service: IntegrationService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: str, content_type: str = "application/json"):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if urlparse(self.path).path != "/health":
+                return self._send(404, json.dumps({"error": "not found"}))
+            self._send(200, json.dumps({"status": "ok", "rows_integrated": service.rows_integrated}))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/integrate":
+                return self._send(404, json.dumps({"error": "not found"}))
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                rows = payload["rows"]
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send(400, json.dumps({"error": f"bad request: {e}"}))
+            append = parse_qs(url.query).get("append", ["0"])[0] not in ("0", "false", "")
+            try:
+                lines = service.integrate(rows, append=append)
+            except (KeyError, TypeError, AttributeError) as e:
+                return self._send(400, json.dumps({"error": f"malformed row: {e}"}))
+            self._send(200, "".join(line + "\n" for line in lines), content_type="application/n-triples")
+
+    return Handler
+
+
+def main(host: str = HOST, port: int = PORT, output_path: str = OUTPUT_NT):
+    print("[INFO] Loading ontology and indexes …")
+    service = IntegrationService(output_path)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"[INFO] Integration service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the integration indexes warm and integrate rows over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--output", default=OUTPUT_NT, help="N-Triples file that ?append=1 writes to")
+    args = parser.parse_args()
+    main(args.host, args.port, args.output)
@@ -0,0 +1,93 @@
+"""
+JSONL files joined by key (custom_id) instead of by line number.
+
+``write_keyed_jsonl`` writes one JSON value per line, as before, plus a byte-offset index
+(".<name>.idx.json": key -> offset of its line) next to the file. ``KeyedJsonl`` reads single
+values by key with one seek each, so data.csv rows can be joined with the LLM results in a
+single pass over the CSV, no matter in which order (or in how many shards) the results came in.
+
+    write_keyed_jsonl("ingredients.jsonl", answers.items())
+    with KeyedJsonl("ingredients.jsonl") as results:
+        results.get("42")
+
+Files without an index (written before it existed) are indexed by line number, i.e. line i
+belongs to custom_id "i", which is what the positional pairing assumed.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Iterable
+
+from source_cache import source_tag
+
+
+def _index_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.idx.json")
+
+
+def custom_id_order(key: str):
+    """Sort key: numeric custom_ids by value, others after them."""
+    return (0, int(key), "") if key.isdigit() else (1, 0, key)
+
+
+def write_keyed_jsonl(path: str | Path, items: Iterable[tuple[str, Any]]) -> None:
+    """Write ``(key, value)`` pairs as one JSON line per value, ordered by key, with the offset index."""
+    path = Path(path)
+    offsets: dict[str, int] = {}
+    with open(path, "wb") as f:
+        for key, value in sorted(items, key=lambda kv: custom_id_order(kv[0])):
+            offsets[key] = f.tell()
+            f.write((json.dumps(value) + "\n").encode("utf-8"))
+    _index_path(path).write_text(json.dumps({"source": source_tag(path), "offsets": offsets}), encoding="utf-8")
+
+
+class KeyedJsonl:
+    """Read-only access to the values of a JSONL by key."""
+
+    def __init__(self, path: str | Path, offsets: dict[str, int] | None = None):
+        self.path = Path(path)
+        self.file = open(self.path, "rb")
+        # ``offsets`` (from ``subset``) restricts the file to part of its keys without loading the index
+        self.offsets = offsets if offsets is not None else self._load_offsets()
+
+    def _load_offsets(self) -> dict[str, int]:
+        index_path = _index_path(self.path)
+        if index_path.exists():
+            index = json.loads(index_path.read_text(encoding="utf-8"))
+            if index.get("source") == source_tag(self.path):
+                return index["offsets"]
+            print(f"[WARN] {index_path} is older than {self.path}, pairing lines by position")
+        # no (valid) index: line i belongs to key "i"
+        offsets, offset = {}, 0
+        for i, line in enumerate(self.file):
+            offsets[str(i)] = offset
+            offset += len(line)
+        return offsets
+
+    def __enter__(self) -> "KeyedJsonl":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.file.close()
+
+    def subset(self, keys: Iterable[str]) -> dict[str, int]:
+        """The offsets of ``keys`` only, e.g. to hand one shard of the file to a worker process."""
+        return {key: self.offsets[key] for key in keys if key in self.offsets}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.offsets
+
+    def get(self, key: str) -> Any:
+        """The value of ``key``; None if there is none or its line is not valid JSON."""
+        offset = self.offsets.get(key)
+        if offset is None:
+            return None
+        self.file.seek(offset)
+        line = self.file.readline().strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
@@ -0,0 +1,97 @@
+"""
+Multi-keyword matcher (Aho–Corasick automaton) shared by the keyword rules of the pipeline:
+clustering.assign_category, clean_data_by_category.is_relevant_category and the rename /
+remove rules of clean_llm_results.
+
+All keywords are compiled into one automaton, so a string is checked against every rule in a
+single left-to-right pass, however many rules there are. Every keyword carries a value (a
+category, a rule, …); the query methods return the values of the keywords found.
+
+    matcher = KeywordMatcher({"pizza": "allowed", "adult": "excluded"})
+    matcher.values("Pizza Place")     # {"allowed"}
+    matcher.exact("adult")            # "excluded"
+
+Matching is case-insensitive by default. With ``word_boundary=True`` a keyword only matches
+as a whole word (not inside another word), otherwise any occurrence counts, like ``in``.
+Rules that only apply to whole strings (``exact``) are looked up in a dict of the keywords
+instead of running the automaton.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Iterable, Iterator, Mapping
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Mapping[str, Any] | Iterable[tuple[str, Any]],
+                 word_boundary: bool = False, case_sensitive: bool = False):
+        self.word_boundary = word_boundary
+        self.case_sensitive = case_sensitive
+        pairs = keywords.items() if isinstance(keywords, Mapping) else keywords
+        # keyword -> value of its first rule, for exact()
+        self.keywords: dict[str, Any] = {}
+
+        # trie: goto[state][char] -> state; out[state] = [(keyword length, value), ...]
+        self.goto: list[dict[str, int]] = [{}]
+        self.out: list[list[tuple[int, Any]]] = [[]]
+        for keyword, value in pairs:
+            keyword = self._fold(keyword)
+            if not keyword:
+                continue
+            self.keywords.setdefault(keyword, value)
+            state = 0
+            for ch in keyword:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                state = nxt
+            self.out[state].append((len(keyword), value))
+
+        # failure links, breadth first; outputs of the fallback states are merged in
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def _fold(self, text: str) -> str:
+        return text if self.case_sensitive else text.lower()
+
+    @staticmethod
+    def _is_boundary(text: str, i: int) -> bool:
+        return i < 0 or i >= len(text) or not text[i].isalnum()
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int, Any]]:
+        """(start, end, value) of every keyword occurrence in ``text``, in order of their end."""
+        text = self._fold(text)
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, value in out[state]:
+                start, end = i - length + 1, i + 1
+                if self.word_boundary and not (self._is_boundary(text, start - 1) and self._is_boundary(text, end)):
+                    continue
+                yield start, end, value
+
+    def values(self, text: str) -> set:
+        """Values of all keywords occurring in ``text``."""
+        return {value for _, _, value in self.iter_matches(text)}
+
+    def any(self, text: str) -> bool:
+        return next(self.iter_matches(text), None) is not None
+
+    def exact(self, text: str, default: Any = None) -> Any:
+        """Value of the keyword that is exactly ``text`` (``default`` if there is none)."""
+        return self.keywords.get(self._fold(text), default)
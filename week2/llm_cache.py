@@ -0,0 +1,81 @@
+"""
+Content-addressed store of LLM classification responses.
+
+Every response is stored under the SHA-256 of what determines it: model, system prompt,
+user message and temperature. create_batch.py leaves out requests whose key is already
+stored, and get_batch_results.py stores the fresh responses and merges them with the cached
+ones into one results JSONL, in the usual batch output format. After a prompt change only
+rows whose prompt actually changed are sent again.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from typing import Iterable
+
+LLM_CACHE_DB = "llm_cache.sqlite"
+
+
+def request_key(body: dict) -> str:
+    """Cache key of a chat-completion request body."""
+    messages = {m["role"]: m["content"] for m in body["messages"]}
+    content = [body["model"], messages.get("system", ""), messages.get("user", ""), body.get("temperature")]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str = LLM_CACHE_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body TEXT NOT NULL)")
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.conn.close()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, dict]:
+        """Stored response bodies of ``keys`` (keys without a response are left out)."""
+        keys = list(set(keys))
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, body FROM responses WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((key, json.loads(body)) for key, body in rows)
+        return found
+
+    def put_many(self, responses: dict[str, dict]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, body) VALUES (?, ?)",
+                ((key, json.dumps(body)) for key, body in responses.items()),
+            )
+
+
+def merge_cached_results(lines: list[str], keys: dict[str, str], cache: ResponseCache) -> list[str]:
+    """
+    Store the successful responses of the batch output ``lines`` and add a result line for
+    every request of ``keys`` (custom_id -> cache key) that was answered from the cache.
+    """
+    fresh = [json.loads(line) for line in lines if line.strip()]
+    cache.put_many({
+        keys[r["custom_id"]]: r["response"]["body"]
+        for r in fresh
+        if r["custom_id"] in keys and not r.get("error") and (r.get("response") or {}).get("status_code") == 200
+    })
+
+    answered = {r["custom_id"] for r in fresh}
+    cached = cache.get_many(key for custom_id, key in keys.items() if custom_id not in answered)
+    merged = list(lines)
+    for custom_id, key in keys.items():
+        if custom_id not in answered and key in cached:
+            merged.append(json.dumps({
+                "id": None,
+                "custom_id": custom_id,
+                "response": {"status_code": 200, "request_id": None, "body": cached[key]},
+                "error": None,
+            }))
+    return merged
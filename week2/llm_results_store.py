@@ -0,0 +1,204 @@
+"""
+Parse-once store of LLM batch results (llm_results/*.jsonl), shared by
+validate_classification, create_ingredients.jsonl.py, copy_pizza_ingredients_to_clean_json,
+ingredient_QID_mapping and clean_llm_results.
+
+A results JSONL is parsed exactly once into columns with one row per menu item of an answer:
+
+    custom_id, line, item_index, shape ("object" | "array" | "error"),
+    name, is_pizza, ingredients, other, error, raw
+
+``other`` holds the JSON of an item that does not have exactly the usual fields (name,
+is_pizza, ingredients), so every answer can be rebuilt unchanged; ``error`` / ``raw`` are set
+for answers that could not be parsed. With pyarrow installed, the columns are kept in an
+Arrow IPC file next to the JSONL (".<name>.arrow"), refreshed as soon as the JSONL changes,
+so later pipeline stages load them without decoding any JSON.
+
+The answers are parsed by ``parse_answer``: the ```json fences are removed and the first JSON
+value (object or array) is decoded, ignoring explanations the model wrote after it.
+
+Usage:
+    results = load_llm_results("llm_results/results_15_complete.jsonl")
+    results.answers()           # {custom_id: parsed answer}, like load_results_jsonl
+    for item in results.items(): ...   # one dict per menu item
+"""
+from __future__ import annotations
+
+import json
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # orjson not installed
+    loads = json.loads
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow not installed
+    pa = None
+
+from source_cache import load_once, open_snapshot, write_snapshot
+
+ITEM_FIELDS = ["name", "is_pizza", "ingredients"]
+COLUMNS = ["custom_id", "line", "item_index", "shape", "name", "is_pizza", "ingredients", "other", "error", "raw"]
+
+_decoder = json.JSONDecoder()
+
+
+def parse_answer(content: str) -> Any:
+    """The JSON value (object or array) of a model answer, without fences and trailing text."""
+    text = content.replace("```json", "").replace("```", "").strip()
+    try:
+        return _decoder.raw_decode(text)[0]
+    except json.JSONDecodeError:
+        # some text before the JSON value
+        starts = [i for i in (text.find("{"), text.find("[")) if i > 0]
+        if not starts:
+            raise
+        return _decoder.raw_decode(text, min(starts))[0]
+
+
+def _is_regular(item: Any) -> bool:
+    return (
+        isinstance(item, dict)
+        and list(item) == ITEM_FIELDS
+        and isinstance(item["name"], str)
+        and isinstance(item["is_pizza"], bool)
+        and isinstance(item["ingredients"], list)
+        and all(isinstance(i, str) for i in item["ingredients"])
+    )
+
+
+def _item_row(item: Any) -> dict:
+    if _is_regular(item):
+        return {"name": item["name"], "is_pizza": item["is_pizza"], "ingredients": item["ingredients"], "other": None}
+    fields = item if isinstance(item, dict) else {}
+    ingredients = fields.get("ingredients")
+    return {
+        "name": fields.get("name") if isinstance(fields.get("name"), str) else None,
+        "is_pizza": fields.get("is_pizza") if isinstance(fields.get("is_pizza"), bool) else None,
+        "ingredients": [str(i) for i in ingredients] if isinstance(ingredients, list) else None,
+        "other": json.dumps(item, ensure_ascii=False),
+    }
+
+
+def parse_results_jsonl(path: str | Path) -> dict[str, list]:
+    """Parse a results JSONL into the store's columns."""
+    columns: dict[str, list] = {c: [] for c in COLUMNS}
+
+    def add(**row):
+        for c in COLUMNS:
+            columns[c].append(row.get(c))
+
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f):
+            if not line.strip():
+                continue
+            data = loads(line)
+            custom_id = data.get("custom_id")
+            response_text = None
+            try:
+                # Batch response format puts the actual content in `response`
+                if "response" in (data or {}) and "body" in (data["response"] or {}):
+                    response_text = data["response"]["body"]["choices"][0]["message"]["content"]
+                    parsed = parse_answer(response_text)
+                else:
+                    raise KeyError("Missing 'choices' in response['body'].")
+            except Exception as e:
+                add(custom_id=custom_id, line=line_no, item_index=-1, shape="error",
+                    error=f"Failed to parse: {e}", raw=response_text or json.dumps(data))
+                continue
+
+            if isinstance(parsed, list):
+                if not parsed:
+                    add(custom_id=custom_id, line=line_no, item_index=-1, shape="array")
+                for index, item in enumerate(parsed):
+                    add(custom_id=custom_id, line=line_no, item_index=index, shape="array", **_item_row(item))
+            else:
+                add(custom_id=custom_id, line=line_no, item_index=0, shape="object", **_item_row(parsed))
+    return columns
+
+
+class LLMResults:
+    """The parsed results of one JSONL, held as one list per column."""
+
+    def __init__(self, columns: dict[str, list]):
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns["custom_id"])
+
+    def rows(self) -> Iterator[dict]:
+        cols = [self.columns[c] for c in COLUMNS]
+        for values in zip(*cols):
+            yield dict(zip(COLUMNS, values))
+
+    def items(self) -> Iterator[dict]:
+        """One dict per menu item of all answers that could be parsed."""
+        for row in self.rows():
+            if row["item_index"] >= 0:
+                yield row
+
+    @staticmethod
+    def _item(row: dict) -> Any:
+        if row["other"] is not None:
+            return json.loads(row["other"])
+        return {"name": row["name"], "is_pizza": row["is_pizza"], "ingredients": row["ingredients"]}
+
+    @cached_property
+    def _answers(self) -> dict[str, Any]:
+        answers: dict[str, Any] = {}
+        last_line = None
+        for row in self.rows():
+            custom_id = row["custom_id"]
+            if row["shape"] == "error":
+                answers[custom_id] = {"error": row["error"], "raw": row["raw"]}
+            elif row["shape"] == "object":
+                answers[custom_id] = self._item(row)
+            else:
+                if row["line"] != last_line:
+                    answers[custom_id] = []
+                if row["item_index"] >= 0:
+                    answers[custom_id].append(self._item(row))
+            last_line = row["line"]
+        return answers
+
+    def answers(self) -> dict[str, Any]:
+        """{custom_id: parsed answer (object, array or {"error", "raw"})}, in file order."""
+        return self._answers
+
+
+# ---------------------------  Loading  -------------------------------------------------
+
+
+def _schema() -> "pa.Schema":
+    return pa.schema([
+        ("custom_id", pa.string()), ("line", pa.int64()), ("item_index", pa.int64()), ("shape", pa.string()),
+        ("name", pa.string()), ("is_pizza", pa.bool_()), ("ingredients", pa.list_(pa.string())),
+        ("other", pa.string()), ("error", pa.string()), ("raw", pa.string()),
+    ])
+
+
+def _read_with_pyarrow(path: Path) -> dict[str, list]:
+    reader = open_snapshot(path)
+    if reader is not None:
+        table = reader.read_all()
+        return {name: col.to_pylist() for name, col in zip(table.column_names, table.columns)}
+
+    columns = parse_results_jsonl(path)
+    table = pa.Table.from_pydict(columns, schema=_schema())
+    write_snapshot(path, table.schema, table.to_batches())
+    return columns
+
+
+def _load(path: Path) -> LLMResults:
+    return LLMResults(_read_with_pyarrow(path) if pa is not None else parse_results_jsonl(path))
+
+
+def load_llm_results(path: str | Path) -> LLMResults:
+    """Load the results of ``path`` once per process (and, with pyarrow, once per change of the file)."""
+    return load_once(path, _load)
@@ -0,0 +1,125 @@
+"""
+Columnar reader for data.csv, shared by the integration, the city mapping, the batch
+creation and the classification check.
+
+Rows are streamed one Arrow record batch at a time, so memory stays flat however large the
+CSV is, and only the requested columns are turned into Python values. The CSV is parsed
+once by pyarrow's streaming reader into an Arrow IPC snapshot next to it; every further
+read memory-maps the snapshot (refreshed as soon as the CSV's size or modification time
+changes), and a row range [start, stop) skips the batches before it without reading them.
+Without pyarrow the rows are read with the csv module.
+
+Usage:
+    for row in iter_rows("data.csv"): ...                               # dicts, like csv.DictReader
+    for row in iter_rows("data.csv", ["name", "city"], 1000, 2000): ...  # columns and row range
+    count_rows("data.csv"), cities("data.csv")
+"""
+from __future__ import annotations
+
+import csv
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow not installed
+    pa = None
+
+from source_cache import open_snapshot, write_snapshot
+
+DATA_CSV = "data.csv"
+PIZZERIA_KEY_COLUMNS = ("name", "address", "city", "state", "country")
+
+
+def pizzeria_key(row: dict) -> tuple:
+    """Columns that identify a pizzeria."""
+    return tuple(row[c] for c in PIZZERIA_KEY_COLUMNS)
+
+
+def _header(csv_path: Path) -> list[str]:
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f))
+
+
+def _open_csv(csv_path: Path, columns: Sequence[str] | None = None) -> "pa_csv.CSVStreamingReader":
+    """pyarrow's streaming reader of ``csv_path``; every value is a string, missing ones are ''."""
+    return pa_csv.open_csv(
+        str(csv_path),
+        # quoted descriptions may span several lines (and read blocks), like csv.DictReader allows
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in _header(csv_path)},
+            strings_can_be_null=False,
+            include_columns=columns,
+        ),
+    )
+
+
+def _snapshot_reader(csv_path: Path):
+    """Reader of the snapshot of ``csv_path``, written batch by batch first if there is none."""
+    reader = open_snapshot(csv_path)
+    if reader is None:
+        batches = _open_csv(csv_path)
+        write_snapshot(csv_path, batches.schema, batches)
+        reader = open_snapshot(csv_path)
+    return reader
+
+
+def _iter_batches(csv_path: Path, columns: Sequence[str] | None, start: int, stop: int | None):
+    reader = _snapshot_reader(csv_path)
+    if reader is None:  # snapshot could not be written, stream the CSV itself
+        batches, select = _open_csv(csv_path, columns), False
+    else:
+        batches, select = (reader.get_batch(i) for i in range(reader.num_record_batches)), columns is not None
+
+    offset = 0
+    for batch in batches:
+        n = batch.num_rows
+        if offset + n > start:
+            lo = max(start - offset, 0)
+            hi = n if stop is None else min(stop - offset, n)
+            part = batch.slice(lo, hi - lo)
+            yield part.select(list(columns)) if select else part
+        offset += n
+        if stop is not None and offset >= stop:
+            break
+
+
+def _iter_csv_rows(csv_path: Path, columns: Sequence[str] | None, start: int, stop: int | None):
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        wanted = [(i, name) for i, name in enumerate(header) if columns is None or name in columns]
+        if columns is not None:
+            wanted.sort(key=lambda c: list(columns).index(c[1]))
+        for row in islice(reader, start, stop):
+            # short rows get '' for the missing values, like the pyarrow path
+            yield {name: row[i] if i < len(row) else "" for i, name in wanted}
+
+
+def iter_rows(path: str = DATA_CSV, columns: Sequence[str] | None = None,
+              start: int = 0, stop: int | None = None) -> Iterator[dict]:
+    """Yield the rows [start, stop) of ``path`` as dicts of ``columns`` (default: all)."""
+    csv_path = Path(path)
+    if pa is None:
+        yield from _iter_csv_rows(csv_path, columns, start, stop)
+        return
+    for batch in _iter_batches(csv_path, columns, start, stop):
+        yield from batch.to_pylist()
+
+
+def count_rows(path: str = DATA_CSV) -> int:
+    """Number of rows of ``path`` (from the batch lengths of the snapshot, without reading values)."""
+    csv_path = Path(path)
+    if pa is not None:
+        reader = _snapshot_reader(csv_path)
+        if reader is not None:
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return sum(1 for _ in _iter_csv_rows(csv_path, [], 0, None))
+
+
+def cities(path: str = DATA_CSV) -> list[str]:
+    """Sorted distinct, non-empty city names."""
+    return sorted({row["city"].strip() for row in iter_rows(path, ["city"])} - {""})
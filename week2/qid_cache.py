@@ -0,0 +1,99 @@
+"""
+Persistent cache of label → Wikidata QID lookups, used by ingredient_QID_mapping.py and
+city_QID_mapping.py in front of the network resolver (qid_resolver.py).
+
+Hits and misses are stored in a SQLite file with the time they were fetched. A hit stays
+valid for HIT_TTL_DAYS, a miss ("not found") for MISS_TTL_DAYS, so labels without an item
+are retried now and then, but not on every run. Labels of batches that failed (network,
+rate limit, …) are not stored and are queried again on the next run. Locked entries of
+locked_qid_map.json / locked_city_qid_map.json still override everything; the scripts
+only pass the remaining labels.
+
+Delete qid_cache.sqlite (or lower the TTLs) to force a full refresh.
+
+If an offline label index built by wikidata_label_index.py exists, it is asked first; only
+labels it has no QID for (e.g. because it was built from a subset of the dump) go on to the
+cache and the network.
+"""
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Iterable
+
+from qid_resolver import SPARQL_ENDPOINT, resolve_qids
+from wikidata_label_index import LabelIndex, label_index_available
+
+QID_CACHE_DB = "qid_cache.sqlite"
+HIT_TTL_DAYS = 180
+MISS_TTL_DAYS = 14
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class QIDCache:
+    def __init__(self, path: str = QID_CACHE_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS qids (
+                kind       TEXT NOT NULL,
+                label      TEXT NOT NULL,
+                qid        TEXT,           -- NULL: not found
+                fetched_at REAL NOT NULL,  -- unix time
+                PRIMARY KEY (kind, label)
+            )
+            """
+        )
+
+    def __enter__(self) -> "QIDCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.conn.close()
+
+    def lookup(self, kind: str, now: float | None = None) -> dict[str, str | None]:
+        """All entries of ``kind`` that have not expired yet."""
+        now = time.time() if now is None else now
+        rows = self.conn.execute(
+            """
+            SELECT label, qid FROM qids
+            WHERE kind = ? AND fetched_at >= ? - CASE WHEN qid IS NULL THEN ? ELSE ? END
+            """,
+            (kind, now, MISS_TTL_DAYS * DAY_SECONDS, HIT_TTL_DAYS * DAY_SECONDS),
+        )
+        return dict(rows)
+
+    def store(self, kind: str, qids: dict[str, str | None], now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO qids (kind, label, qid, fetched_at) VALUES (?, ?, ?, ?)",
+                ((kind, label, qid, now) for label, qid in qids.items()),
+            )
+
+
+def resolve_qids_cached(labels: Iterable[str], kind: str, cache_path: str = QID_CACHE_DB,
+                        endpoint: str = SPARQL_ENDPOINT) -> dict[str, str | None]:
+    """
+    Like ``resolve_qids``, but only labels without a valid cache entry are sent to the endpoint.
+    Labels that could not be resolved because of an error are missing from the result.
+    """
+    labels = set(labels)
+    indexed = {}
+    if label_index_available():
+        with LabelIndex() as index:
+            indexed = {label: qid for label, qid in index.lookup(labels, kind).items() if qid}
+        labels -= indexed.keys()
+        print(f"Label index: {len(indexed)} labels found, {len(labels)} left for the cache / endpoint")
+        if not labels:
+            return indexed
+
+    with QIDCache(cache_path) as cache:
+        cached = cache.lookup(kind)
+        known = {label: cached[label] for label in labels if label in cached}
+        todo = labels - known.keys()
+        print(f"QID cache: {len(known)} of {len(labels)} labels cached, querying {len(todo)}")
+        fetched = resolve_qids(todo, kind, endpoint) if todo else {}
+        cache.store(kind, fetched)
+    return indexed | known | fetched
@@ -0,0 +1,222 @@
+"""
+Batched label → Wikidata QID resolution, shared by ingredient_QID_mapping.py and city_QID_mapping.py.
+
+Instead of one SPARQL query per label, up to BATCH_SIZE labels are sent in one query: the
+labels are bound in a VALUES block and fed to the EntitySearch MWAPI service, and the type
+filter of the respective script (food types / city types) is applied to all of them at once.
+Every result row carries the label it was found for and its search rank, so the results
+are joined back to the labels on the client side (best rank wins, like the former LIMIT 1).
+
+The batches are sent concurrently (asyncio): a token bucket limits the request rate to
+REQUESTS_PER_SECOND, at most MAX_CONCURRENCY requests are in flight, every request has a
+timeout, and requests answered with 429 or 5xx are retried with exponential backoff
+(honouring a Retry-After header). The HTTP calls themselves are plain ``requests`` calls
+run in worker threads, so no async HTTP client is needed.
+
+The endpoint can be replaced by any SPARQL endpoint that answers with
+application/sparql-results+json, e.g. a local stand-in for tests:
+
+    WIKIDATA_SPARQL=http://localhost:8000/sparql python ingredient_QID_mapping.py
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Iterable
+
+import requests
+
+SPARQL_ENDPOINT = os.environ.get("WIKIDATA_SPARQL", "https://query.wikidata.org/sparql")
+BATCH_SIZE = 50
+REQUESTS_PER_SECOND = 5
+MAX_CONCURRENCY = 5  # the public endpoint allows 5 parallel queries per client
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 2  # doubled with every retry
+TIMEOUT_SECONDS = 60
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# type filters, as used by the per-label queries of both scripts before
+TYPE_FILTERS: dict[str, dict] = {
+    "food": {
+        "path": "(wdt:P31|wdt:P279)+",
+        "types": {
+            "Q2095": "food",
+            "Q746549": "food ingredient",
+            "Q25403900": "food additive",
+            "Q11004": "vegetable",
+            "Q9323487": "edible plant (plant as food)",
+            "Q207123": "herb",
+            "Q3088299": "cow's milk cheese",
+        },
+    },
+    "city": {
+        "path": "(wdt:P31|wdt:P279)",
+        "types": {
+            "Q515": "city",
+            "Q1549591": "big city",
+            "Q486972": "human settlement",
+            "Q3957": "town",
+            "Q7930989": "village",
+        },
+    },
+}
+
+
+def build_query(labels: list[str], kind: str) -> str:
+    """SPARQL query resolving all ``labels`` at once with the type filter ``kind``."""
+    type_filter = TYPE_FILTERS[kind]
+    values = " ".join(json.dumps(label, ensure_ascii=False) for label in labels)
+    types = "\n        ".join(f"wd:{qid}  # {name}" for qid, name in type_filter["types"].items())
+    return f"""
+    SELECT ?label ?item ?ordinal WHERE {{
+      VALUES ?label {{ {values} }}
+      SERVICE wikibase:mwapi {{
+        bd:serviceParam wikibase:endpoint "www.wikidata.org" ;
+                        wikibase:api      "EntitySearch" ;
+                        mwapi:search      ?label ;
+                        mwapi:language    "en" .
+        ?item wikibase:apiOutputItem mwapi:item .
+        ?ordinal wikibase:apiOrdinal true .
+      }}
+
+      VALUES ?type {{
+        {types}
+      }}
+      ?item {type_filter["path"]} ?type.
+    }}
+    """
+
+
+def join_results(labels: list[str], bindings: list[dict]) -> dict[str, str | None]:
+    """Map every label to the best ranked QID found for it (None if there is none)."""
+    best: dict[str, tuple[int, str]] = {}
+    for b in bindings:
+        label = b["label"]["value"]
+        qid = b["item"]["value"].split("/")[-1]
+        rank = int(b.get("ordinal", {}).get("value", 0))
+        if label not in best or rank < best[label][0]:
+            best[label] = (rank, qid)
+    return {label: best[label][1] if label in best else None for label in labels}
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average, bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int | None = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.retry_after = _retry_after(response)
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _post_sparql(query: str, accept: str, endpoint: str) -> requests.Response:
+    response = requests.post(endpoint, data={"query": query}, headers={"Accept": accept}, timeout=TIMEOUT_SECONDS)
+    if response.status_code in RETRY_STATUS:
+        raise RetryableStatus(response)
+    response.raise_for_status()
+    return response
+
+
+async def post_sparql(query: str, accept: str, endpoint: str, bucket: TokenBucket, limit: asyncio.Semaphore,
+                      what: str = "query") -> requests.Response:
+    """Send one query within the rate limit, retried on 429/5xx and timeouts."""
+    for attempt in range(MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            async with limit:
+                return await asyncio.to_thread(_post_sparql, query, accept, endpoint)
+        except (RetryableStatus, requests.Timeout, requests.ConnectionError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = getattr(e, "retry_after", None) or BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+            print(f"Retrying {what} in {delay:.1f}s ({e})")
+            await asyncio.sleep(delay)
+
+
+async def query_batch(labels: list[str], kind: str, endpoint: str,
+                      bucket: TokenBucket, limit: asyncio.Semaphore) -> dict[str, str | None]:
+    """Resolve one batch of labels with a single request."""
+    response = await post_sparql(build_query(labels, kind), "application/sparql-results+json", endpoint,
+                                 bucket, limit, what=f"batch starting with {labels[0]!r}")
+    return join_results(labels, response.json()["results"]["bindings"])
+
+
+async def run_queries_async(queries: list[str], accept: str, endpoint: str = SPARQL_ENDPOINT) -> list[str | None]:
+    """Response bodies of ``queries`` (None for a query that failed for good), in order."""
+    bucket = TokenBucket(REQUESTS_PER_SECOND)
+    limit = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def run(i: int, query: str) -> str | None:
+        try:
+            return (await post_sparql(query, accept, endpoint, bucket, limit, what=f"query {i + 1}")).text
+        except (requests.RequestException, RetryableStatus) as e:
+            print(f"Query {i + 1} of {len(queries)} failed: {e}")
+            return None
+
+    return list(await asyncio.gather(*(run(i, q) for i, q in enumerate(queries))))
+
+
+def run_queries(queries: list[str], accept: str, endpoint: str = SPARQL_ENDPOINT) -> list[str | None]:
+    """Blocking wrapper of ``run_queries_async``, for other stages talking to the same endpoint."""
+    return asyncio.run(run_queries_async(queries, accept, endpoint))
+
+
+def batched(items: list, size: int) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def resolve_qids_async(labels: Iterable[str], kind: str, endpoint: str = SPARQL_ENDPOINT,
+                             batch_size: int = BATCH_SIZE) -> dict[str, str | None]:
+    """
+    Resolve ``labels`` to QIDs of the given ``kind`` ("food" or "city"), ``batch_size`` per request.
+    Labels that were not found map to None; labels of a batch that failed for good are left out.
+    """
+    bucket = TokenBucket(REQUESTS_PER_SECOND)
+    limit = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def resolve(batch: list[str]) -> dict[str, str | None]:
+        try:
+            return await query_batch(batch, kind, endpoint, bucket, limit)
+        except (requests.RequestException, RetryableStatus, KeyError, ValueError) as e:
+            print(f"Query failed for batch starting with {batch[0]!r}: {e}")
+            return {}
+
+    qids: dict[str, str | None] = {}
+    for result in await asyncio.gather(*(resolve(b) for b in batched(sorted(set(labels)), batch_size))):
+        qids.update(result)
+    return qids
+
+
+def resolve_qids(labels: Iterable[str], kind: str, endpoint: str = SPARQL_ENDPOINT,
+                 batch_size: int = BATCH_SIZE) -> dict[str, str | None]:
+    """Blocking entry point of the scripts, see ``resolve_qids_async``."""
+    return asyncio.run(resolve_qids_async(labels, kind, endpoint, batch_size))
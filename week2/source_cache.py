@@ -0,0 +1,86 @@
+"""
+Helpers shared by the caches that are derived from a source file (parse snapshots, indexes,
+manifests): they tell whether a cache still belongs to the current version of its file.
+
+``file_digest`` identifies a file by its content (SHA-256), ``source_tag`` cheaply by its size
+and modification time. Parsed tables are kept as Arrow IPC snapshots next to their file
+(``open_snapshot`` / ``write_snapshot``, only with pyarrow installed), and ``load_once``
+memoizes a loader per process and file version.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterable, TypeVar
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pyarrow not installed
+    pa = None
+
+T = TypeVar("T")
+
+
+def file_digest(path: str | Path) -> str:
+    """SHA-256 of the content of ``path``, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_tag(path: str | Path) -> str:
+    """Cheap version tag of ``path`` (size and modification time)."""
+    stat = Path(path).stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# ---------------------------  Arrow snapshots  -----------------------------------------
+
+
+def snapshot_path(path: Path) -> Path:
+    """The Arrow IPC snapshot of ``path``, kept next to it (".<name>.arrow")."""
+    return path.with_name(f".{path.name}.arrow")
+
+
+def open_snapshot(path: Path) -> "pa_ipc.RecordBatchFileReader | None":
+    """Memory-mapped reader of the snapshot of ``path``; None if there is none for its current version."""
+    snapshot = snapshot_path(path)
+    if pa is None or not snapshot.exists():
+        return None
+    try:
+        reader = pa_ipc.open_file(pa.memory_map(str(snapshot)))
+    except (pa.ArrowInvalid, OSError):
+        return None  # unreadable snapshot, parse again
+    if (reader.schema.metadata or {}).get(b"source") != source_tag(path).encode():
+        return None
+    return reader
+
+
+def write_snapshot(path: Path, schema: "pa.Schema", batches: Iterable["pa.RecordBatch"]) -> None:
+    """Write ``batches`` as the snapshot of the current version of ``path`` (atomically)."""
+    snapshot = snapshot_path(path)
+    schema = schema.with_metadata({b"source": source_tag(path).encode()})
+    tmp = snapshot.with_suffix(".tmp")
+    try:
+        with pa_ipc.new_file(str(tmp), schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        os.replace(tmp, snapshot)
+    except OSError as e:
+        print(f"[WARN] Could not write {snapshot}: {e}")
+
+
+_loaded: dict[tuple, Any] = {}
+
+
+def load_once(path: str | Path, load: Callable[[Path], T]) -> T:
+    """``load(path)``, computed once per process and version of ``path``."""
+    path = Path(path)
+    key = (str(path.resolve()), source_tag(path), load)
+    if key not in _loaded:
+        _loaded[key] = load(path)
+    return _loaded[key]
@@ -0,0 +1,219 @@
+"""
+Low-latency alternative to the Batch API: classify menu items right away against any
+OpenAI-compatible chat-completions endpoint (OpenAI, a local server, a stand-in, …).
+
+    python stream_classifier.py --csv new_rows.csv --all
+    python stream_classifier.py --base-url http://127.0.0.1:8000/v1 --concurrency 32
+
+The requests are exactly those of create_batch.py (same SYSTEM_PROMPT, model, temperature,
+deduplication and response cache). Up to ``--concurrency`` requests are in flight; the limit
+adapts to the endpoint: it is halved on every 429 (rate limited) and grows back by one step
+per window of successful requests. 429/5xx answers and timeouts are retried with backoff.
+
+Every answer is appended to the output JSONL as soon as it arrives, in the batch output
+format, so validate_classification.load_results_jsonl and the later pipeline steps read it
+like a downloaded batch. The custom_ids are row numbers of the input CSV, so every input CSV
+gets an output of its own (by default llm_results/results_stream_<name>_<hash>.jsonl, named
+after the CSV's content), and the input an output belongs to is recorded next to it
+("<output>.input.json"). Rows that are already in the output are skipped, so an interrupted
+run simply continues; an output of another input is refused.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+import create_batch
+from create_batch import expand_results, read_csv, skip_cached
+from llm_cache import ResponseCache, merge_cached_results
+from source_cache import file_digest
+
+OUTPUT_DIR = "llm_results"
+MAX_CONCURRENCY = 16
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 2  # doubled with every retry
+TIMEOUT_SECONDS = 60
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to the endpoint (additive increase, multiplicative decrease):
+    halved when the endpoint answers 429, raised by one after ``limit`` successes in a row.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    async def succeeded(self) -> None:
+        async with self.condition:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify_all()
+
+    async def rate_limited(self) -> None:
+        async with self.condition:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def _retry_after(e: Exception) -> float | None:
+    response = getattr(e, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+async def classify(client: AsyncOpenAI, item: dict, limiter: AdaptiveLimiter) -> dict:
+    """One request of create_batch.py, answered as a line of the batch output format."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with limiter:
+                completion = await client.chat.completions.create(**item["body"])
+            await limiter.succeeded()
+            return {
+                "id": f"stream_req_{completion.id}",
+                "custom_id": item["custom_id"],
+                "response": {"status_code": 200, "request_id": completion.id, "body": completion.model_dump()},
+                "error": None,
+            }
+        except openai.OpenAIError as e:
+            if isinstance(e, openai.RateLimitError):
+                await limiter.rate_limited()
+            if not _is_retryable(e) or attempt == MAX_RETRIES:
+                return {
+                    "id": None,
+                    "custom_id": item["custom_id"],
+                    "response": None,
+                    "error": {"code": type(e).__name__, "message": str(e)},
+                }
+            delay = _retry_after(e) or BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay)
+
+
+def default_output(csv_path: str, csv_digest: str) -> str:
+    """Output of the input CSV with content digest ``csv_digest``."""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(OUTPUT_DIR, f"results_stream_{stem}_{csv_digest[:12]}.jsonl")
+
+
+def claim_output(output_path: str, csv_path: str, csv_digest: str) -> None:
+    """
+    Record that ``output_path`` holds the answers for the CSV with ``csv_digest``. Its
+    custom_ids are row numbers of that CSV, so an output of another input is refused.
+    """
+    marker = output_path + ".input.json"
+    if os.path.exists(output_path):
+        claimed = None
+        if os.path.exists(marker):
+            with open(marker, encoding="utf-8") as f:
+                claimed = json.load(f).get("digest")
+        if claimed != csv_digest:
+            raise ValueError(f"{output_path} holds the answers for another input than {csv_path}, "
+                             f"choose another --output")
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"csv": csv_path, "digest": csv_digest}, f)
+
+
+def answered_custom_ids(output_path: str) -> set[str]:
+    """Rows that already have a successful answer in the output."""
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    if not result.get("error"):
+                        done.add(result["custom_id"])
+    return done
+
+
+async def classify_all(client: AsyncOpenAI, items: list[dict], groups: dict, keys: dict, cache: ResponseCache,
+                       output_path: str, concurrency: int = MAX_CONCURRENCY) -> tuple[int, int]:
+    """Send ``items`` and append every answer (expanded to its group) as soon as it arrives."""
+    limiter = AdaptiveLimiter(concurrency)
+    ok = failed = 0
+    with open(output_path, "a", encoding="utf-8") as out:
+        for next_result in asyncio.as_completed([classify(client, item, limiter) for item in items]):
+            result = await next_result
+            if result["error"]:
+                failed += 1
+                print(f"{result['custom_id']}: ❌ {result['error']['message']}")
+                continue
+            ok += 1
+            cache.put_many({keys[result["custom_id"]]: result["response"]["body"]})
+            for line in expand_results([json.dumps(result)], groups):
+                out.write(line + "\n")
+            out.flush()
+    return ok, failed
+
+
+def main(csv_path: str, output_path: str | None, base_url: str | None, concurrency: int, full: bool):
+    csv_digest = file_digest(csv_path)
+    output_path = output_path or default_output(csv_path, csv_digest)
+    claim_output(output_path, csv_path, csv_digest)
+    create_batch.UPLOAD_FULL_BATCH = full
+    items, groups = read_csv(csv_path, create_batch.included_lines, deduplicate=True)
+
+    # rows answered by an earlier (interrupted) run
+    done = answered_custom_ids(output_path)
+    groups = {first: [c for c in rows if c not in done] for first, rows in groups.items()}
+    groups = {first: rows for first, rows in groups.items() if rows}
+    items = [item for item in items if item["custom_id"] in groups]
+
+    with ResponseCache() as cache:
+        new_items, keys = skip_cached(items, cache)
+        # cached answers are written right away, like get_batch_results.py merges them
+        new_ids = {item["custom_id"] for item in new_items}
+        cached_keys = {custom_id: key for custom_id, key in keys.items() if custom_id not in new_ids}
+        with open(output_path, "a", encoding="utf-8") as out:
+            for line in expand_results(merge_cached_results([], cached_keys, cache), groups):
+                out.write(line + "\n")
+
+        print(f"{len(new_items)} requests ({len(items) - len(new_items)} cached, {len(done)} rows done before)")
+        client = AsyncOpenAI(base_url=base_url, timeout=TIMEOUT_SECONDS, max_retries=0)
+        start = time.perf_counter()
+        ok, failed = asyncio.run(classify_all(client, new_items, groups, keys, cache, output_path, concurrency))
+
+    print(f"✅ {ok} answered, {failed} failed in {time.perf_counter() - start:.1f}s, appended to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify menu items right away instead of via the Batch API.")
+    parser.add_argument("--csv", default="data.csv")
+    parser.add_argument("--output", default=None,
+                        help=f"default: {OUTPUT_DIR}/results_stream_<csv name>_<csv hash>.jsonl, one per input")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible API (default: OPENAI_BASE_URL or OpenAI)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="upper limit of requests in flight")
+    parser.add_argument("--all", action="store_true", help="classify all rows, not only create_batch.included_lines")
+    args = parser.parse_args()
+    main(args.csv, args.output, args.base_url, args.concurrency, args.all)
@@ -1,56 +1,32 @@
-import csv
 import json
 import os
 
+from llm_results_store import load_llm_results
+from menu_table import iter_rows
+
 def load_csv_data(csv_path):
     items = {}
-    with open(csv_path, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        lol = 0
-        for row in reader:
-            menu_item = row["menu item"]
-            description = row["item description"] or ""
-            restaurant = row["name"]
-            # Match an exact custom_id format
-            custom_id = f"{lol}"
-            items[custom_id] = {
-                "restaurant": restaurant,
-                "name": menu_item,
-                "description": description
-            }
-            lol += 1
+    for lol, row in enumerate(iter_rows(csv_path, ["name", "menu item", "item description"])):
+        menu_item = row["menu item"]
+        description = row["item description"] or ""
+        restaurant = row["name"]
+        # Match an exact custom_id format
+        custom_id = f"{lol}"
+        items[custom_id] = {
+            "restaurant": restaurant,
+            "name": menu_item,
+            "description": description
+        }
     return items
 
 
 def load_results_jsonl(jsonl_path):
-    results = {}
-    with open(jsonl_path, encoding="utf-8") as f:
-        for line in f:
-            data = json.loads(line)
-            custom_id = data.get("custom_id")
-            response_text = None  # make sure it's always defined
-            try:
-                # Batch response format typically puts actual content in `response`
-                if "response" in data and "body" in data["response"]:
-                    choices = data["response"]["body"]["choices"]
-                    response_text = choices[0]["message"]["content"]
-                    response_text = response_text.replace("```json", "").replace("```", "")
-                    parsed = json.loads(response_text)
-                else:
-                    raise KeyError("Missing 'choices' in response['body'].")
-            except Exception as e:
-                parsed = {
-                    "error": f"Failed to parse: {e}",
-                    "raw": response_text or json.dumps(data)
-                }
-            results[custom_id] = parsed
-        return results
+    # parsed once into the columnar store, see llm_results_store.py
+    return load_llm_results(jsonl_path).answers()
 
 def find_matching_result_key(match_key, result_keys):
-    for key in result_keys:
-        if key == match_key:
-            return key
-    return None
+    # result_keys is a dict view, so this is a hash lookup, not a scan
+    return match_key if match_key in result_keys else None
 
 def display_comparison(input_data, output_data):
     for match_key, item in input_data.items():
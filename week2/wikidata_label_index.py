@@ -0,0 +1,238 @@
+"""
+Offline label → QID index, built from a local Wikidata JSON dump (or a filtered subset of it).
+
+Build it once from a dump (plain, .gz or .bz2; one entity per line, as in latest-all.json.gz):
+
+    python wikidata_label_index.py latest-all.json.gz
+
+The dump is streamed line by line and the index is written to LABEL_INDEX_DB (SQLite):
+
+    labels    normalized English label / alias -> QID
+    entities  QID -> number of sitelinks (ranks equally labeled items, like the search ranking)
+    edges     QID -> direct P31 (instance of) / P279 (subclass of) targets
+    kinds     QID -> "food" / "city" with the P31/P279 path to the matching type
+
+The kinds are derived with the type filters of qid_resolver.py: for "food" any
+(P31|P279)+ path to a food type, for "city" a direct P31/P279 edge to a city type. The dump
+therefore has to contain the class items on those paths, not only the ingredients and cities.
+
+As soon as the index exists, qid_cache.resolve_qids_cached (and with it both QID scripts)
+answers from it; only labels the index has no QID for go on to the cache and the SPARQL
+endpoint. Unlike EntitySearch, labels are matched
+exactly after normalization (case, whitespace), aliases rank behind labels.
+"""
+from __future__ import annotations
+
+import argparse
+import bz2
+import gzip
+import os
+import sqlite3
+from typing import Iterable, Iterator
+
+from qid_resolver import TYPE_FILTERS
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # orjson not installed
+    import json
+
+    loads = json.loads
+
+LABEL_INDEX_DB = os.environ.get("WIKIDATA_LABEL_INDEX", "wikidata_labels.sqlite")
+INSERT_BATCH = 10_000
+LANGUAGE = "en"
+CLASS_PROPERTIES = ("P31", "P279")
+
+
+def normalize_label(label: str) -> str:
+    return " ".join(label.casefold().split())
+
+
+# ---------------------------  Dump reading  -------------------------------------------
+
+
+def open_dump(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_entities(path: str) -> Iterator[dict]:
+    """Entities of the dump; the dump is one big JSON array with one entity per line."""
+    with open_dump(path) as f:
+        for line in f:
+            line = line.strip().rstrip(b",")
+            if line in (b"", b"[", b"]"):
+                continue
+            yield loads(line)
+
+
+def class_targets(entity: dict) -> Iterator[str]:
+    claims = entity.get("claims", {})
+    for prop in CLASS_PROPERTIES:
+        for claim in claims.get(prop, []):
+            value = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+            if isinstance(value, dict) and "id" in value:
+                yield value["id"]
+
+
+def entity_rows(entity: dict) -> tuple[list, list, tuple]:
+    qid = entity["id"]
+    names = {}
+    label = entity.get("labels", {}).get(LANGUAGE)
+    if label:
+        names[normalize_label(label["value"])] = 0
+    for alias in entity.get("aliases", {}).get(LANGUAGE, []):
+        names.setdefault(normalize_label(alias["value"]), 1)
+    labels = [(name, qid, is_alias) for name, is_alias in names.items()]
+    edges = [(qid, target) for target in dict.fromkeys(class_targets(entity))]
+    return labels, edges, (qid, len(entity.get("sitelinks", {})))
+
+
+# ---------------------------  Building  -----------------------------------------------
+
+
+SCHEMA = """
+CREATE TABLE labels   (label TEXT NOT NULL, qid TEXT NOT NULL, is_alias INTEGER NOT NULL);
+CREATE TABLE entities (qid TEXT PRIMARY KEY, sitelinks INTEGER NOT NULL);
+CREATE TABLE edges    (qid TEXT NOT NULL, target TEXT NOT NULL);
+CREATE TABLE kinds    (qid TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (qid, kind));
+"""
+
+INDEXES = """
+CREATE INDEX labels_label ON labels (label);
+CREATE INDEX edges_target ON edges (target);
+"""
+
+
+def load_dump(conn: sqlite3.Connection, dump_path: str) -> int:
+    labels, edges, entities = [], [], []
+
+    def flush():
+        conn.executemany("INSERT INTO labels VALUES (?, ?, ?)", labels)
+        conn.executemany("INSERT INTO edges VALUES (?, ?)", edges)
+        conn.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?)", entities)
+        labels.clear()
+        edges.clear()
+        entities.clear()
+
+    n = 0
+    for entity in iter_entities(dump_path):
+        if entity.get("type") != "item":
+            continue
+        l, e, row = entity_rows(entity)
+        labels += l
+        edges += e
+        entities.append(row)
+        n += 1
+        if len(entities) >= INSERT_BATCH:
+            flush()
+        if n % 1_000_000 == 0:
+            print(f"{n} items read")
+    flush()
+    return n
+
+
+def _subjects(conn: sqlite3.Connection, targets: list[str]) -> Iterator[tuple[str, str]]:
+    for start in range(0, len(targets), 500):
+        chunk = targets[start:start + 500]
+        yield from conn.execute(
+            f"SELECT qid, target FROM edges WHERE target IN ({','.join('?' * len(chunk))})", chunk
+        )
+
+
+def derive_kind(conn: sqlite3.Connection, kind: str) -> int:
+    """Store every item matching the type filter ``kind`` with its path to the matching type."""
+    type_filter = TYPE_FILTERS[kind]
+    transitive = type_filter["path"].endswith("+")
+    # parent[q] = the next QID on the way from q to a type (a breadth-first search on reversed edges)
+    parent: dict[str, str | None] = {}
+    frontier = list(type_filter["types"])
+    matches: dict[str, None] = {}
+    while frontier:
+        found = []
+        for qid, target in _subjects(conn, frontier):
+            if qid not in parent and qid not in type_filter["types"]:
+                parent[qid] = target
+                found.append(qid)
+        matches.update(dict.fromkeys(found))
+        frontier = found if transitive else []
+
+    def path(qid: str) -> str:
+        steps = [qid]
+        while steps[-1] in parent:
+            steps.append(parent[steps[-1]])
+        return " ".join(steps)
+
+    conn.executemany("INSERT OR REPLACE INTO kinds VALUES (?, ?, ?)", ((q, kind, path(q)) for q in matches))
+    return len(matches)
+
+
+def build_index(dump_path: str, index_path: str = LABEL_INDEX_DB) -> None:
+    tmp = f"{index_path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+    n = load_dump(conn, dump_path)
+    conn.executescript(INDEXES)
+    print(f"{n} items indexed")
+    for kind in TYPE_FILTERS:
+        print(f"{kind}: {derive_kind(conn, kind)} matching items")
+    conn.commit()
+    conn.close()
+    os.replace(tmp, index_path)  # readers never see a half-built index
+
+
+# ---------------------------  Lookup  -------------------------------------------------
+
+
+class LabelIndex:
+    def __init__(self, path: str = LABEL_INDEX_DB):
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def __enter__(self) -> "LabelIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.conn.close()
+
+    def lookup(self, labels: Iterable[str], kind: str) -> dict[str, str | None]:
+        """Best QID of the given ``kind`` for every label (None if there is none)."""
+        return {label: self.lookup_one(label, kind) for label in labels}
+
+    def lookup_one(self, label: str, kind: str) -> str | None:
+        row = self.conn.execute(
+            """
+            SELECT l.qid FROM labels l
+            JOIN kinds k ON k.qid = l.qid AND k.kind = ?
+            LEFT JOIN entities e ON e.qid = l.qid
+            WHERE l.label = ?
+            ORDER BY l.is_alias, e.sitelinks DESC
+            LIMIT 1
+            """,
+            (kind, normalize_label(label)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def path(self, qid: str, kind: str) -> list[str]:
+        """P31/P279 path from ``qid`` to the type that makes it a ``kind`` (empty if it is none)."""
+        row = self.conn.execute("SELECT path FROM kinds WHERE qid = ? AND kind = ?", (qid, kind)).fetchone()
+        return row[0].split() if row else []
+
+
+def label_index_available(path: str = LABEL_INDEX_DB) -> bool:
+    return os.path.exists(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline label index from a Wikidata JSON dump.")
+    parser.add_argument("dump", help="Wikidata JSON dump (or subset), optionally .gz/.bz2 compressed")
+    parser.add_argument("--output", default=LABEL_INDEX_DB, help="SQLite file to write")
+    args = parser.parse_args()
+    build_index(args.dump, args.output)
@@ -1,8 +1,14 @@
-from rdflib import Graph, Literal
+import sys
+from pathlib import Path
+
+from rdflib import Literal
 from rdflib import RDF, RDFS, Namespace
 from rdflib.namespace import OWL, XSD
 from owlrl import DeductiveClosure, OWLRL_Semantics
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / "week2"))
+from graph_cache import load_graph
+
 SCHEMA = Namespace("http://schema.org/")
 
 def remove_invalid_owl_triples(graph):
@@ -26,9 +32,9 @@ def remove_invalid_owl_triples(graph):
 
 if __name__ == "__main__":
     # Step 1: Load base ontology and data
-    g = Graph()
-    g.parse("../week1/ontology.xml", format="xml")
-    g.parse("../week2/pizza_data.ttl", format="turtle")
+    # the data graph is the big one, so the ontology is merged into it
+    g = load_graph("../week2/pizza_data.ttl", format="turtle")
+    g += load_graph("../week1/ontology.xml", format="xml")
 
 
     print(f"Original triples: {len(g)}")
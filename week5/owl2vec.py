@@ -30,9 +30,11 @@ import subprocess
 from pathlib import Path
 from typing import List, Optional
 
-import rdflib
 from gensim.models import KeyedVectors
 
+sys.path.append(str(Path(__file__).resolve().parent.parent / "week2"))
+from graph_cache import load_graph
+
 logging.basicConfig(level=logging.INFO,
                     format="[%(levelname)s] %(message)s")
 
@@ -56,13 +58,11 @@ def _rdf_format(path: Path) -> str:
 def merge_graphs(onto_file: Path, data_file: Path, *, sample_triples: Optional[int],
                  dest_file: Path) -> None:
     """Load two RDF files, optionally subsample triples, and write RDF/XML."""
-    g = rdflib.Graph()
     logging.info("Loading ontology … %s", onto_file)
-    g.parse(str(onto_file), format=_rdf_format(onto_file))
+    g = load_graph(onto_file, format=_rdf_format(onto_file))
 
-    g_data = rdflib.Graph()
     logging.info("Loading data     … %s", data_file)
-    g_data.parse(str(data_file), format=_rdf_format(data_file))
+    g_data = load_graph(data_file, format=_rdf_format(data_file))
 
     if sample_triples is not None and sample_triples < len(g_data):
         logging.info("Sampling %d of %d data triples", sample_triples, len(g_data))